@@ -1,475 +1,8 @@
-import pygame, sys, random
+import pygame, sys, os, time, random, argparse, threading, queue
 from pygame.locals import *
-import copy
-
-# abstract class for all chess pieces
-class piece(object):
-    def __init__(self, x, y, color):
-        self.x = x
-        self.y = y
-        self.color = color
-        self.hasMoved = False
-
-        # A list of moves, abstracting dependency on prior elements
-        # (Consider subset forward of a rook, moving forward 6 is only possible
-        #  If you can move forward 5)
-        self.lineOfSight = []
-
-        # A list of lineOfSights
-        self.lineOfSightList = []
-        
-        # Line Of Sights, truncated vision (Also handles castling)
-        self.truncatedLineOfSights = [] 
-
-        # The final list of moves, 
-        # filtered for illegal moves which blunder the king,
-        self.trueMoves = []
-        self.updateFreeMoves()
-        
-    def getCoords(self):
-        return([self.x,self.y])
-    
-    def getColor(self):
-        return(self.color)
-    # Checks if coords lie on board, appends to self.lineOfSight
-    def validateFreeMoveIsOnBoard(self, coords):
-        if coords[0] >= 0 and coords[0] <= 7 and coords[1] >= 0 and coords[1] <= 7:
-            self.lineOfSight.append(coords)
-            return True
-        else:
-            return False
-    
-    # pop free moves and add it to lineOfSight
-    def appendSubsetMoves(self):
-        if len(self.lineOfSight) != 0:
-            self.lineOfSightList.append(self.lineOfSight)
-            self.lineOfSight = []
-    
-    # Filters lineOfSightList
-    # Truncates lineOfSights to the first piece seen
-    # Updates truncatedLineOfSights
-    def truncateLineOfSights(self, board):
-        self.truncatedLineOfSights = []
-        for lineOfSight in self.lineOfSightList:
-            for j in range(len(lineOfSight)):
-                rank = lineOfSight[j][1]
-                file = lineOfSight[j][0]
-                if board[rank][file] is not None:
-                    if self.color == board[rank][file].color:
-                        # Same colour piece, end lineOfSight
-                        break
-                    else:
-                        # Different colour piece, take and end lineOfSight
-                        self.truncatedLineOfSights.append(lineOfSight[j])
-                        break
-                else:
-                    self.truncatedLineOfSights.append(lineOfSight[j])
-
-    #limits truncatedLineOfSights to only legal moves
-    def updateTrueMoves(self, gameBoard, board):
-        self.trueMoves = []
-        for i in self.truncatedLineOfSights:
-            if gameBoard.checkLegal(board, self.getCoords(), i):
-                self.trueMoves.append(i)
-
-    
-    #checks if a piece has a king in sight
-    def validateCheckKing(self, coords):
-        if coords in self.truncatedLineOfSights:
-            return True
-        else:
-            return False
-        
-        
-
-class pawn(piece):
-    def __init__(self, x, y, color):
-        self.enPassantAble = False
-        super().__init__(x, y, color)
-    
-    def updateFreeMoves(self):
-        self.lineOfSightList = []
-        self.lineOfSight = []
-        if self.color == 'W':
-            self.validateFreeMoveIsOnBoard([self.x,self.y+1])
-            if not self.hasMoved:
-                self.validateFreeMoveIsOnBoard([self.x,self.y+2])
-        else:
-            self.validateFreeMoveIsOnBoard([self.x,self.y-1])
-            if not self.hasMoved:
-                self.validateFreeMoveIsOnBoard([self.x,self.y-2])
-        self.appendSubsetMoves()
-    def truncateLineOfSights(self,board):
-        self.truncatedLineOfSights = []
-        for i in self.lineOfSightList:
-            for j in range(len(i)):
-                if board[i[j][1]][i[j][0]] is not None:
-                    break
-                else:
-                    self.truncatedLineOfSights.append(i[j])
-        #allow taking diagonally
-        if self.getColor() == "W":
-            step = 1
-        else:
-            step = -1
-        if self.y + step >= 0 and self.y + step <= 7:
-            if self.x + 1 >= 0 and self.x + 1 <= 7:
-                if board[self.y + step][self.x + 1] is not None:
-                    if board[self.y + step][self.x + 1].getColor() != self.getColor():
-                        self.truncatedLineOfSights.append([self.x+1,self.y+step])
-            if self.x - 1 >= 0 and self.x - 1 <= 7:
-                if board[self.y + step][self.x - 1] is not None:
-                    if board[self.y + step][self.x - 1].getColor() != self.getColor():
-                        self.truncatedLineOfSights.append([self.x - 1,self.y + step])
-        #allow en passant
-        if (self.getColor() == "W" and self.y == 4) or (self.getColor() == "B" and self.y == 3):
-            if self.x + 1 >= 0 and self.x + 1 <= 7:
-                if board[self.y][self.x + 1] is not None:
-                    if board[self.y][self.x + 1].getChr() == "P":
-                        if board[self.y][self.x + 1].enPassantAble == True:
-                            self.truncatedLineOfSights.append([self.x+1,self.y+step])
-            if self.x - 1 >= 0 and self.x - 1 <= 7:
-                if board[self.y][self.x - 1] is not None:
-                    if board[self.y][self.x - 1].getChr() == "P":
-                        if board[self.y][self.x - 1].enPassantAble == True:
-                            self.truncatedLineOfSights.append([self.x-1,self.y+step])
-        
-            
-
-    def disableEnPassant(self):
-        self.enPassantAble = False
-    def enableEnPassant(self):
-        self.enPassantAble = True
-    def getChr(self):
-        return('P')
-
-class rook(piece):
-    def updateFreeMoves(self):
-        self.lineOfSightList = []
-        self.lineOfSight = []
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x, self.y + count]): count += 1
-        self.appendSubsetMoves()
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x, self.y - count]): count += 1
-        self.appendSubsetMoves()
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x + count, self.y]): count += 1
-        self.appendSubsetMoves()
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x - count, self.y]): count += 1
-        self.appendSubsetMoves()
-        
-    def getChr(self):
-        return('R')
-
-class knight(piece):
-    def updateFreeMoves(self):
-        self.lineOfSightList = []
-        self.lineOfSight = []
-        self.validateFreeMoveIsOnBoard([self.x+1,self.y+2])
-        self.appendSubsetMoves()
-        self.validateFreeMoveIsOnBoard([self.x-1,self.y+2])
-        self.appendSubsetMoves()
-        self.validateFreeMoveIsOnBoard([self.x+1,self.y-2])
-        self.appendSubsetMoves()
-        self.validateFreeMoveIsOnBoard([self.x-1,self.y-2])
-        self.appendSubsetMoves()
-        self.validateFreeMoveIsOnBoard([self.x+2,self.y+1])
-        self.appendSubsetMoves()
-        self.validateFreeMoveIsOnBoard([self.x+2,self.y-1])
-        self.appendSubsetMoves()
-        self.validateFreeMoveIsOnBoard([self.x-2,self.y+1])
-        self.appendSubsetMoves()
-        self.validateFreeMoveIsOnBoard([self.x-2,self.y-1])
-        self.appendSubsetMoves()
-    def getChr(self):
-        return('N')
-
-class bishop(piece):
-    def updateFreeMoves(self):
-        self.lineOfSightList = []
-        self.lineOfSight = []
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x + count, self.y + count]) == 1: count += 1
-        self.appendSubsetMoves()
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x + count, self.y - count]) == 1: count += 1
-        self.appendSubsetMoves()
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x - count, self.y + count]) == 1: count += 1
-        self.appendSubsetMoves()
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x - count, self.y - count]) == 1: count += 1
-        self.appendSubsetMoves()
-    def getChr(self):
-        return('B')
-
-class queen(piece):
-    def updateFreeMoves(self):
-        self.lineOfSightList = []
-        self.lineOfSight = []
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x + count, self.y + count]) == 1: count += 1
-        self.appendSubsetMoves()
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x + count, self.y - count]) == 1: count += 1
-        self.appendSubsetMoves()
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x - count, self.y + count]) == 1: count += 1
-        self.appendSubsetMoves()
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x - count, self.y - count]) == 1: count += 1
-        self.appendSubsetMoves()
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x, self.y + count]): count += 1
-        self.appendSubsetMoves()
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x, self.y - count]): count += 1
-        self.appendSubsetMoves()
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x + count, self.y]): count += 1
-        self.appendSubsetMoves()
-        count = 1
-        while self.validateFreeMoveIsOnBoard([self.x - count, self.y]): count += 1
-        self.appendSubsetMoves()
-    def getChr(self):
-        return('Q')
-
-class king(piece):
-    def updateFreeMoves(self):
-        self.lineOfSightList = []
-        self.lineOfSight = []
-        self.validateFreeMoveIsOnBoard([self.x,self.y-1])
-        self.appendSubsetMoves()
-        self.validateFreeMoveIsOnBoard([self.x+1,self.y-1])
-        self.appendSubsetMoves()
-        self.validateFreeMoveIsOnBoard([self.x+1,self.y])
-        self.appendSubsetMoves()
-        self.validateFreeMoveIsOnBoard([self.x+1,self.y+1])
-        self.appendSubsetMoves()
-        self.validateFreeMoveIsOnBoard([self.x,self.y+1])
-        self.appendSubsetMoves()
-        self.validateFreeMoveIsOnBoard([self.x-1,self.y+1])
-        self.appendSubsetMoves()
-        self.validateFreeMoveIsOnBoard([self.x-1,self.y])
-        self.appendSubsetMoves()
-        self.validateFreeMoveIsOnBoard([self.x-1,self.y-1])
-        self.appendSubsetMoves()
-    def truncateLineOfSights(self,board):
-        super().truncateLineOfSights(board)
-        # enable castling
-        if self.hasMoved == False:
-            if board[self.y][0] is not None:
-                if board[self.y][0].hasMoved == False:
-                    if board[self.y][1] is None and board[self.y][2] is None:
-                        self.truncatedLineOfSights.append([1,self.y])
-            if board[self.y][7] is not None:
-                if board[self.y][7].hasMoved == False:
-                    if board[self.y][4] is None and board[self.y][5] is None and board[self.y][6] is None:
-                        self.truncatedLineOfSights.append([5,self.y])
-                        
-    def getChr(self):
-        return('K')
-
-class gameBoard:
-    def __init__(self):
-        self.board =[
-         [rook(0,0,'W'), knight(1,0,'W'), bishop(2,0,'W'), king(3,0,'W'), queen(4,0,'W'), bishop(5,0,'W'), knight(6,0,'W'), rook(7,0,'W')], 
-         [pawn(x,1,'W') for x in range(8)], 
-         [None, None, None, None, None, None, None, None], 
-         [None, None, None, None, None, None, None, None],
-         [None, None, None, None, None, None, None, None],
-         [None, None, None, None, None, None, None, None],
-         [pawn(x,6,'B') for x in range(8)],
-         [rook(0,7,'B'), knight(1,7,'B'), bishop(2,7,'B'), king(3,7,'B'), queen(4,7,'B'), bishop(5,7,'B'), knight(6,7,'B'), rook(7,7,'B')]
-         ]
-        self.turn = "W"
-        self.truncateLineOfSights(self.board)
-        self.updateTrueMoves(self.board)
-        self.gameOver = False
-        
-
-    #find all available moves for all pieces
-    def truncateLineOfSights(self, board):
-        for i in board:
-            for j in i:
-                if j is not None:
-                    j.truncateLineOfSights(board)
-    def updateTrueMoves(self, board):
-        for i in board:
-            for j in i:
-                if j is not None:
-                    j.updateTrueMoves(self, board)
-
-    #returns the coords of the color of a king   
-    def findKing(self, board, color):
-        for i in board:
-            for j in i:
-                if j is not None:
-                    if j.getChr() == 'K':
-                        if j.getColor() == color:
-                            return j.getCoords()
-
-    #returns either True or False given a board
-    def evalWhiteInCheck(self, board):
-        kingCoords = self.findKing(board,'W')
-        for i in board:
-            for j in i:
-                if j is not None:
-                    if j.getColor() == 'B':
-                        if j.validateCheckKing(kingCoords):
-                            return True
-        return False
-    
-    def evalBlackInCheck(self, board):
-        kingCoords = self.findKing(board,'B')
-        for i in board:
-            for j in i:
-                if j is not None:
-                    if j.getColor() == 'W':
-                        if j.validateCheckKing(kingCoords):
-                            return True
-        return False
-
-    def clearEnPassant(self, board):
-        for i in board:
-            for j in i:
-                if j is not None:
-                    if j.getChr() == 'P':
-                        j.disableEnPassant()
-
-    def verifyWhiteCheckmate(self, board):
-        count = 0
-        for i in board:
-            for j in i:
-                if j is not None:
-                    if j.getColor() == 'B':
-                        count += len(j.trueMoves)
-        if count == 0:
-            return True
-        else:
-            return False
-
-    def verifyBlackCheckmate(self, board):
-        count = 0
-        for i in board:
-            for j in i:
-                if j is not None:
-                    if j.getColor() == 'W':
-                        count += len(j.trueMoves)
-        if count == 0:
-            return True
-        else:
-            return False
-        
-    # Takes two co-ordinates
-    # Returns true if a move was made
-    def requestMove(self, oldCoords, newCoords):
-        if self.board[oldCoords[1]][oldCoords[0]] is None:
-            print("You have not selectedPiece a piece")
-            return False
-        if self.board[oldCoords[1]][oldCoords[0]].getColor() != self.turn:
-            print("You have selectedPiece the wrong color piece")
-            return False
-        if newCoords not in self.board[oldCoords[1]][oldCoords[0]].truncatedLineOfSights:
-            print("Your piece cannot move there")
-            return False
-        if newCoords not in self.board[oldCoords[1]][oldCoords[0]].trueMoves:
-            print("Your king is unprotected")
-            return False
-        #simulate the next move
-        self.board = self.simulateBoard(self.board, oldCoords, newCoords, False)
-        if self.turn == 'W': self.turn = 'B'
-        else: self.turn = 'W'
-        self.updateTrueMoves(self.board)
-        if self.turn == 'W':
-            if self.verifyBlackCheckmate(self.board):
-                self.gameOver = True
-                print("Checkmate, white wins!")
-        else:
-            if self.verifyWhiteCheckmate(self.board):
-                self.gameOver = True
-                print("Checkmate, black wins!")
-        return True
-
-    #returns True if legal, False if illegal
-    def checkLegal(self, board, oldCoords, newCoords):
-        tempBoard = copy.deepcopy(board)
-        tempBoard = self.simulateBoard(tempBoard, oldCoords, newCoords, True)
-        if self.turn == "W":
-            if self.evalWhiteInCheck(tempBoard):
-                return False
-        else:
-            if self.evalBlackInCheck(tempBoard):
-                return False
-        return True
-    
-    def simulateBoard(self, board, oldCoords, newCoords, quickSim):
-        #handle en passant
-        if board[oldCoords[1]][oldCoords[0]].getChr() == 'P':
-            if oldCoords[0] != newCoords[0]:
-                if board[newCoords[1]][newCoords[0]] is None:
-                    board[oldCoords[1]][newCoords[0]] = None
-
-        #handle castling
-        if board[oldCoords[1]][oldCoords[0]].getChr() == 'K':
-            if abs(oldCoords[0]-newCoords[0]) == 2:
-                if newCoords[0] == 1:
-                    board[oldCoords[1]][2] = board[oldCoords[1]][0]
-                    board[oldCoords[1]][0] = None
-                    board[oldCoords[1]][2].x = 2
-                    board[oldCoords[1]][2].hasMoved = True
-                    board[oldCoords[1]][2].updateFreeMoves()
-                else:
-                    board[oldCoords[1]][4] = board[oldCoords[1]][7]
-                    board[oldCoords[1]][7] = None
-                    board[oldCoords[1]][4].x = 4
-                    board[oldCoords[1]][4].hasMoved = True
-                    board[oldCoords[1]][4].updateFreeMoves()
-
-        #handle normal moves
-        board[newCoords[1]][newCoords[0]] = board[oldCoords[1]][oldCoords[0]]
-        board[oldCoords[1]][oldCoords[0]] = None
-        board[newCoords[1]][newCoords[0]].x = newCoords[0]
-        board[newCoords[1]][newCoords[0]].y = newCoords[1]
-        board[newCoords[1]][newCoords[0]].hasMoved = True
-        board[newCoords[1]][newCoords[0]].updateFreeMoves()
-
-        #enable promotion
-        if board[newCoords[1]][newCoords[0]].getChr() == 'P':
-            if newCoords[1] == 0 or newCoords[1] == 7:
-                chosenPiece  = ""
-                if quickSim:
-                    chosenPiece = "Q"
-                while chosenPiece not in ["Q","R","B","K"]:
-                    chosenPiece  = input("Choose a piece: Q/R/B/K").upper()
-                if chosenPiece == "Q":
-                    board[newCoords[1]][newCoords[0]] = queen(newCoords[0], newCoords[1], board[newCoords[1]][newCoords[0]].getColor())
-                    board[newCoords[1]][newCoords[0]].hasMoved = True
-                if chosenPiece == "R":
-                    board[newCoords[1]][newCoords[0]] = rook(newCoords[0], newCoords[1], board[newCoords[1]][newCoords[0]].getColor())
-                    board[newCoords[1]][newCoords[0]].hasMoved = True
-                if chosenPiece == "K":
-                    board[newCoords[1]][newCoords[0]] = knight(newCoords[0], newCoords[1], board[newCoords[1]][newCoords[0]].getColor())
-                    board[newCoords[1]][newCoords[0]].hasMoved = True
-                if chosenPiece == "B":
-                    board[newCoords[1]][newCoords[0]] = bishop(newCoords[0], newCoords[1], board[newCoords[1]][newCoords[0]].getColor())
-                    board[newCoords[1]][newCoords[0]].hasMoved = True
-
-        #enable en passant
-        self.clearEnPassant(board)
-        if board[newCoords[1]][newCoords[0]].getChr() == 'P':
-            if abs(newCoords[1]-oldCoords[1]) == 2:
-                board[newCoords[1]][newCoords[0]].enableEnPassant()
-                
-        self.truncateLineOfSights(board)
-        return board
-        
-        
-        
-
-pygame.init()
+from rules import gameBoard
+from search import searchEngine
+from book import openingBook
 
 # Colours
 BACKGROUND = (100, 100, 100)
@@ -478,60 +11,335 @@ WHITE = (0,0,0)
 GREEN = (0,255,0)
  
 # Game Setup
-FPS = 60
-fpsClock = pygame.time.Clock()
 WINDOW_WIDTH = 600
 WINDOW_HEIGHT = 600
+IMAGE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Images')
 
+# The board is the largest square of whole squares that fits the window,
+# set by layoutBoard whenever the window changes size
 BOARD_X = 0
 BOARD_Y = 0
 BOARD_WIDTH = 600
 BOARD_HEIGHT = BOARD_WIDTH
-SQUARE_WIDTH = BOARD_WIDTH / 8
-SQUARE_HEIGHT = BOARD_HEIGHT / 8
-
-Board_png = pygame.image.load('Images/Board.png')
-Board_png = pygame.transform.scale(Board_png,(BOARD_WIDTH,BOARD_HEIGHT))
-
-def loadPiece(path):
-    image = pygame.image.load(path)
-    return pygame.transform.scale(image, (SQUARE_WIDTH, SQUARE_HEIGHT))
-
-whitePieces = {'P': loadPiece('Images/wp.png'),
-          'R': loadPiece('Images/wr.png'),
-          'N': loadPiece('Images/wn.png'),
-          'B': loadPiece('Images/wb.png'),
-          'Q': loadPiece('Images/wq.png'),
-          'K': loadPiece('Images/wk.png')}
-
-blackPieces = {'P': loadPiece('Images/bp.png'),
-          'R': loadPiece('Images/br.png'),
-          'N': loadPiece('Images/bn.png'),
-          'B': loadPiece('Images/bb.png'),
-          'Q': loadPiece('Images/bq.png'),
-          'K': loadPiece('Images/bk.png')}
+SQUARE_WIDTH = BOARD_WIDTH // 8
+SQUARE_HEIGHT = BOARD_HEIGHT // 8
+
+# Centres the board in a window of width by height
+def layoutBoard(width, height):
+    global BOARD_X, BOARD_Y, BOARD_WIDTH, BOARD_HEIGHT, SQUARE_WIDTH, SQUARE_HEIGHT
+    SQUARE_WIDTH = max(1, min(width, height) // 8)
+    SQUARE_HEIGHT = SQUARE_WIDTH
+    BOARD_WIDTH = SQUARE_WIDTH * 8
+    BOARD_HEIGHT = BOARD_WIDTH
+    BOARD_X = (width - BOARD_WIDTH) // 2
+    BOARD_Y = (height - BOARD_HEIGHT) // 2
+
+# Squares as they are drawn, each one a board square with its piece already on it.
+# Sprites are keyed by (piece, square colour, square size), where piece is
+# (color, pieceChr) or None, and are made the first time they are needed,
+# in the display's pixel format so blitting them needs no conversion.
+# The images are loaded once, scaling only happens when a new size is needed.
+class spriteCache(object):
+    def __init__(self):
+        self.board = loadImage('Board.png')
+        self.pieceImages = {}
+        for color in ['W', 'B']:
+            for pieceChr in ['P', 'R', 'N', 'B', 'Q', 'K']:
+                self.pieceImages[(color, pieceChr)] = loadImage(color.lower() + pieceChr.lower() + '.png')
+        self.sprites = {}
+        # the light and dark squares of the board, by square size
+        self.tiles = {}
+
+    # light is 0, dark is 1
+    def getTile(self, squareColour, size):
+        if size not in self.tiles:
+            board = pygame.transform.smoothscale(self.board, (size * 8, size * 8))
+            # Board.png starts with a light square in its top left corner
+            self.tiles[size] = [board.subsurface((0, 0, size, size)).copy(),
+                                board.subsurface((size, 0, size, size)).copy()]
+        return self.tiles[size][squareColour]
+
+    def getSprite(self, piece, squareColour, size):
+        key = (piece, squareColour, size)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = self.getTile(squareColour, size).copy()
+            if piece is not None:
+                sprite.blit(pygame.transform.smoothscale(self.pieceImages[piece], (size, size)), (0, 0))
+            sprite = sprite.convert()
+            self.sprites[key] = sprite
+        return sprite
+
+    # Forgets sprites of other sizes, after the window is resized
+    def keepSize(self, size):
+        for key in list(self.sprites):
+            if key[2] != size:
+                del self.sprites[key]
+        for key in list(self.tiles):
+            if key != size:
+                del self.tiles[key]
+
+# Loads an image from the Images folder in the display's pixel format
+def loadImage(name):
+    return pygame.image.load(os.path.join(IMAGE_DIRECTORY, name)).convert_alpha()
+
+# Starts pygame, opens the window and prepares the sprites
+def setupDisplay():
+    global WINDOW, sprites, overlayFont
+    # on Windows the window gets real pixels on high DPI screens, instead of
+    # being drawn small and scaled up by the system
+    os.environ.setdefault('SDL_WINDOWS_DPI_AWARENESS', 'permonitorv2')
+    pygame.init()
+
+    # the window is opened first, images are converted to its pixel format
+    WINDOW = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), RESIZABLE)
+    pygame.display.set_caption('Chess ')
+    layoutBoard(*WINDOW.get_size())
+    sprites = spriteCache()
+    overlayFont = pygame.font.Font(None, 22)
+    # holding a history key keeps moving through the game
+    pygame.key.set_repeat(300, 50)
+    # nothing is drawn on mouse motion, so it need not wake the loop
+    pygame.event.set_blocked(MOUSEMOTION)
+
+# Follows a new window size, the next drawBoard draws at the new size
+def resizeDisplay():
+    layoutBoard(*WINDOW.get_size())
+    sprites.keepSize(SQUARE_WIDTH)
 
 # End of Game Setup
 
-WINDOW = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption('Chess ')
+# posted by the worker when it has a result, so the loop can sleep until then
+WORKER_EVENT = USEREVENT + 1
+
+def squareRect(x, y):
+    return pygame.Rect(BOARD_X + (SQUARE_WIDTH*x), BOARD_Y + (SQUARE_HEIGHT*y), SQUARE_WIDTH, SQUARE_HEIGHT)
+
+# Draws one square with its piece, and the highlight if selected
+# Returns the rect drawn
+def drawSquare(pieces, x, y, selected):
+    rect = squareRect(x, y)
+    WINDOW.blit(sprites.getSprite(pieces[y][x], (x + y) % 2, SQUARE_WIDTH), rect.topleft)
+    #highlight in a green square the selectedPiece
+    if selected == (x, y):
+        pygame.draw.rect(WINDOW, GREEN, rect, 2)
+    return rect
+
+# Draws the whole window
+def drawBoard(pieces, selected):
+    WINDOW.fill(BACKGROUND)
+    for x in range(8):
+        for y in range(8):
+            drawSquare(pieces, x, y, selected)
+    return [WINDOW.get_rect()]
+
+# where the overlay was last drawn
+overlayRect = None
+
+# Draws the time the last move took and the time the last frame took
+# over the top left corner of the board, after drawing again what it covered before
+# Returns the rects drawn
+def drawOverlay(pieces, selected, moveTime, frameTime):
+    global overlayRect
+    if moveTime is None:
+        text = "move -  frame %.1f ms" % (1000 * frameTime)
+    else:
+        text = "move %.1f ms  frame %.1f ms" % (1000 * moveTime, 1000 * frameTime)
+    surface = overlayFont.render(text, True, GREEN, BLACK)
+    rect = surface.get_rect(topleft=(BOARD_X + 4, BOARD_Y + 4))
+    covered = rect
+    if overlayRect is not None:
+        covered = rect.union(overlayRect)
+    WINDOW.fill(BACKGROUND, covered)
+    rects = [covered]
+    for x in range(8):
+        for y in range(8):
+            if squareRect(x, y).colliderect(covered):
+                rects.append(drawSquare(pieces, x, y, selected))
+    WINDOW.blit(surface, rect)
+    overlayRect = rect
+    return rects
+
+# Returns the squares whose piece differs between two snapshots:
+# the from and to squares, a piece taken en passant, a castling rook
+def changedSquares(oldPieces, newPieces):
+    squares = []
+    for x in range(8):
+        for y in range(8):
+            if oldPieces[y][x] != newPieces[y][x]:
+                squares.append((x, y))
+    return squares
+
+# Returns what the window needs to draw a gameBoard,
+# so the main loop never reads a board the worker is changing
+# moveTime is the seconds the last move took to check and play, or to search for
+def boardSnapshot(myBoard, thinking, moveTime = None):
+    pieces = [[None for x in range(8)] for y in range(8)]
+    for i in myBoard.board:
+        for j in i:
+            if j is not None:
+                pieces[j.y][j.x] = (j.getColor(), j.getChr())
+    return {'pieces': pieces, 'turn': myBoard.turn, 'gameOver': myBoard.gameOver, 'thinking': thinking,
+            'moveTime': moveTime, 'ply': len(myBoard.moveRecords),
+            'plies': len(myBoard.moveRecords) + len(myBoard.undoneMoves)}
+
+# Owns the gameBoard and the computer player on a thread of its own.
+# The main loop puts moves on requests, and takes a boardSnapshot
+# from results after every change, so checking moves and searching
+# never stop the window from drawing.
+class gameWorker(object):
+    # computerColor is 'W', 'B' or None for two players
+    # notify is called from the worker thread after each result
+    # book is an optional book.openingBook the computer plays from first
+    def __init__(self, computerColor = None, thinkTime = 2.0, notify = None, book = None):
+        self.computerColor = computerColor
+        self.thinkTime = thinkTime
+        self.notify = notify
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.engine = searchEngine(book=book)
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def requestMove(self, oldCoords, newCoords):
+        self.requests.put(('move', oldCoords, newCoords))
+
+    # Moves through the game's history: 'undo', 'redo', or 'ply' with the ply to go to
+    def requestHistory(self, action, ply = None):
+        self.requests.put((action, ply))
+
+    # Cancels any search and ends the thread
+    def stop(self):
+        self.cancelled.set()
+        self.engine.stop()
+        self.requests.put(('quit',))
+        self.thread.join(1.0)
+
+    def postResult(self, snapshot):
+        self.results.put(snapshot)
+        if self.notify is not None:
+            self.notify()
+
+    def run(self):
+        myBoard = gameBoard()
+        self.postResult(boardSnapshot(myBoard, False))
+        self.playComputerMove(myBoard)
+        while True:
+            request = self.requests.get()
+            if request[0] == 'quit':
+                return
+            if request[0] == 'move':
+                start = time.perf_counter()
+                myBoard.requestMove(request[1], request[2])
+                self.postResult(boardSnapshot(myBoard, False, time.perf_counter() - start))
+                self.playComputerMove(myBoard)
+            if request[0] in ('undo', 'redo', 'ply'):
+                self.moveThroughHistory(myBoard, request[0], request[1])
+                self.postResult(boardSnapshot(myBoard, False))
+                # the computer only plays on from the end of the history
+                if len(myBoard.undoneMoves) == 0:
+                    self.playComputerMove(myBoard)
+
+    # Against the computer undo and redo go on to the player's next turn
+    def moveThroughHistory(self, myBoard, action, ply):
+        if action == 'ply':
+            myBoard.goToPly(ply)
+        elif action == 'undo':
+            if myBoard.undoMove() and myBoard.turn == self.computerColor:
+                myBoard.undoMove()
+        elif myBoard.redoMove() and myBoard.turn == self.computerColor:
+            myBoard.redoMove()
+
+    # plays the computer's move if it is the computer's turn
+    def playComputerMove(self, myBoard):
+        if myBoard.gameOver or myBoard.turn != self.computerColor or self.cancelled.is_set():
+            return
+        self.postResult(boardSnapshot(myBoard, True))
+        start = time.perf_counter()
+        move = self.engine.search(myBoard, timeLimit=self.thinkTime)
+        if self.cancelled.is_set() or move is None:
+            return
+        myBoard.requestMove(move[0], move[1], move[2] or "Q")
+        self.postResult(boardSnapshot(myBoard, False, time.perf_counter() - start))
+
+# the history request of each key, from the latest boardSnapshot
+HISTORY_KEYS = {K_LEFT: lambda state: ('undo',), K_BACKSPACE: lambda state: ('undo',),
+                K_RIGHT: lambda state: ('redo',),
+                K_HOME: lambda state: ('ply', 0), K_END: lambda state: ('ply', state['plies'])}
+
+# posts WORKER_EVENT, pygame.event.post is safe from other threads
+def notifyMainLoop():
+    pygame.event.post(pygame.event.Event(WORKER_EVENT))
 
 # The main function that controls the game
-def main () :
+# It sleeps until an event arrives, and only redraws squares that changed
+# showOverlay shows how long moves and frames take, F3 turns it on and off
+# Left and Right take back and play again moves, Home and End go to the start and end of the game
+def main (computerColor = None, thinkTime = 2.0, bookPath = None, showOverlay = False) :
+  setupDisplay()
   looping = True
-
-  myBoard = gameBoard()
+  # seconds the last frame took, from its first event to updating the display
+  frameTime = 0.0
+  # the last move's time, kept while later snapshots have none
+  moveTime = None
+
+  book = None
+  if bookPath is not None:
+    book = openingBook(bookPath)
+  worker = gameWorker(computerColor, thinkTime, notifyMainLoop, book)
+  # the latest boardSnapshot from the worker
+  state = worker.results.get()
+  # a move has been sent to the worker and its result has not come back
+  waiting = False
   # square that a player selects
   selectedPiece = None
+
+  # what is on screen
+  drawnPieces = state['pieces']
+  drawnSelection = None
+  pygame.display.update(drawBoard(drawnPieces, drawnSelection))
   
   # The main game loop
   while looping :
-    # Get inputs
-    for event in pygame.event.get() :
+    redrawAll = False
+    # Get inputs, waiting for the first one
+    events = [pygame.event.wait()] + pygame.event.get()
+    frameStart = time.perf_counter()
+    for event in events :
       if event.type == QUIT :
+        worker.stop()
         pygame.quit()
         sys.exit()
-      if not myBoard.gameOver:
+      if event.type in (VIDEOEXPOSE, WINDOWEXPOSED):
+        redrawAll = True
+      if event.type == KEYDOWN and event.key == K_F3:
+        showOverlay = not showOverlay
+        redrawAll = True
+      if event.type == KEYDOWN and not waiting and not state['thinking']:
+        if event.key in HISTORY_KEYS:
+          worker.requestHistory(*HISTORY_KEYS[event.key](state))
+          waiting = True
+          selectedPiece = None
+      # The window surface already has its new size, squares are laid out again
+      if event.type in (VIDEORESIZE, WINDOWSIZECHANGED):
+        resizeDisplay()
+        redrawAll = True
+      # Take the worker's results
+      if event.type == WORKER_EVENT:
+        while not worker.results.empty():
+          state = worker.results.get()
+          waiting = False
+          if state['moveTime'] is not None:
+            moveTime = state['moveTime']
+          if state['thinking']:
+              pygame.display.set_caption('Chess - thinking')
+          elif state['ply'] != state['plies']:
+              pygame.display.set_caption('Chess - move %d of %d' % (state['ply'], state['plies']))
+          else:
+              pygame.display.set_caption('Chess ')
+      # Clicks wait while the worker checks a move or the computer thinks
+      if not state['gameOver'] and not waiting and not state['thinking']:
           # Game only updates on MOUSEBUTTONDOWN
           if event.type == MOUSEBUTTONDOWN:
               if event.button == 1:
@@ -544,68 +352,40 @@ def main () :
                   if square_X >= 0 and square_X <= 7 and square_Y >= 0 and square_Y <= 7:
                       if selectedPiece == None:
                           # Start Square
-                          selectedPiece = myBoard.board[square_Y][square_X]
+                          selectedPiece = state['pieces'][square_Y][square_X]
                           selected_X, selected_Y  = square_X, square_Y
                       else:
                           # End square
-                          request = myBoard.requestMove([selected_X, selected_Y], [square_X, square_Y])
-                          if request is False:
-                              selectedPiece = None
-                          else:
-                              selectedPiece = None
+                          worker.requestMove([selected_X, selected_Y], [square_X, square_Y])
+                          waiting = True
+                          selectedPiece = None
  
-    # Render elements of the game
-    WINDOW.fill(BACKGROUND)
-
-    #Render the board
-    WINDOW.blit(Board_png, (BOARD_X, BOARD_Y))
-    #Render the pieces
-    for i in range(8):
-        for j in range(8):
-            if myBoard.board[j][i] is not None:
-                if myBoard.board[j][i].getColor() == 'W':
-                    WINDOW.blit( whitePieces[myBoard.board[j][i].getChr()] , (BOARD_X + (SQUARE_WIDTH*i), BOARD_Y + (SQUARE_HEIGHT*j)) )
-                else:
-                    WINDOW.blit( blackPieces[myBoard.board[j][i].getChr()] , (BOARD_X + (SQUARE_WIDTH*i), BOARD_Y + (SQUARE_HEIGHT*j)) )
-    #highlight in a green square the selectedPiece
+    # Render only what changed
+    selection = None
     if selectedPiece is not None:
-        rect = pygame.Rect(BOARD_X + (selected_X * SQUARE_WIDTH), BOARD_Y + (selected_Y * SQUARE_HEIGHT), SQUARE_WIDTH, SQUARE_HEIGHT)
-        pygame.draw.rect(WINDOW, GREEN, rect, 2)
-
-    pygame.display.update()
-    fpsClock.tick(FPS)
+        selection = (selected_X, selected_Y)
+    if redrawAll:
+        dirtyRects = drawBoard(state['pieces'], selection)
+    else:
+        dirtySquares = changedSquares(drawnPieces, state['pieces'])
+        if selection != drawnSelection:
+            for square in [selection, drawnSelection]:
+                if square is not None and square not in dirtySquares:
+                    dirtySquares.append(square)
+        dirtyRects = [drawSquare(state['pieces'], x, y, selection) for x, y in dirtySquares]
+    if showOverlay:
+        dirtyRects += drawOverlay(state['pieces'], selection, moveTime, frameTime)
+    drawnPieces = state['pieces']
+    drawnSelection = selection
+    if len(dirtyRects) != 0:
+        pygame.display.update(dirtyRects)
+    frameTime = time.perf_counter() - frameStart
  
-main()
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-    
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play chess")
+    parser.add_argument("--computer", choices=["W", "B"], default=None, help="the side the computer plays")
+    parser.add_argument("--think-time", type=float, default=2.0, help="seconds the computer thinks per move")
+    parser.add_argument("--book", default=None, help="opening book from book.py for the computer")
+    parser.add_argument("--overlay", action="store_true", help="show how long moves and frames take, F3 toggles it")
+    args = parser.parse_args()
+    main(args.computer, args.think_time, args.book, args.overlay)
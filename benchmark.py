@@ -0,0 +1,103 @@
+import sys, time, random, copy, tracemalloc
+from rules import gameBoard
+
+# Benchmarks legal move generation (gameBoard.updateTrueMoves) per position,
+# comparing the "pins" generator and the in place makeMove/unmakeMove legality check
+# of every move ("objects") against the deepcopy of the board per candidate move it replaced.
+# python benchmark.py [games] [plies]
+# python benchmark.py memory [copies]
+# measures the memory of a board's pieces and how fast the board deepcopies
+
+# gameBoard with the old legality check, kept here as the baseline
+class deepcopyGameBoard(gameBoard):
+    def checkLegal(self, board, oldCoords, newCoords):
+        color = board[oldCoords[1]][oldCoords[0]].getColor()
+        tempBoard = copy.deepcopy(board)
+        tempBoard = self.simulateBoard(tempBoard, oldCoords, newCoords, True)
+        kingCoords = self.findKing(tempBoard, color)
+        for i in tempBoard:
+            for j in i:
+                if j is not None:
+                    if j.getColor() != color:
+                        if j.validateCheckKing(kingCoords):
+                            return False
+        return True
+
+# returns every legal move for the side to move as [oldCoords, newCoords]
+def legalMoves(myBoard):
+    moves = []
+    for i in myBoard.board:
+        for j in i:
+            if j is not None and j.getColor() == myBoard.turn:
+                for k in j.trueMoves:
+                    moves.append([j.getCoords(), k])
+    return moves
+
+# plays a move without asking for a promotion piece
+def playMove(myBoard, oldCoords, newCoords):
+    myBoard.board = myBoard.simulateBoard(myBoard.board, oldCoords, newCoords, True)
+    if myBoard.turn == 'W': myBoard.turn = 'B'
+    else: myBoard.turn = 'W'
+
+# times updateTrueMoves on each board over the same random games
+def benchmarkLegalMoves(games, plies):
+    totals = {'pins': 0.0, 'makeMove': 0.0, 'deepcopy': 0.0}
+    positions = 0
+    for seed in range(games):
+        rand = random.Random(seed)
+        boards = {'pins': gameBoard("pins"), 'makeMove': gameBoard("objects"), 'deepcopy': deepcopyGameBoard("objects")}
+        for ply in range(plies):
+            for name, myBoard in boards.items():
+                start = time.perf_counter()
+                myBoard.updateTrueMoves(myBoard.board)
+                totals[name] += time.perf_counter() - start
+            moves = legalMoves(boards['pins'])
+            for name in ['makeMove', 'deepcopy']:
+                if sorted(moves) != sorted(legalMoves(boards[name])):
+                    print("Legal moves differ in game", seed, "at ply", ply)
+                    sys.exit(1)
+            positions += 1
+            if len(moves) == 0:
+                break
+            oldCoords, newCoords = rand.choice(moves)
+            for myBoard in boards.values():
+                playMove(myBoard, oldCoords, newCoords)
+
+    print("positions:", positions)
+    for name, total in totals.items():
+        print("%-9s %8.3f s  %8.1f positions/s  %7.3f ms/position" % (name, total, positions / total, 1000 * total / positions))
+    print("speedup over deepcopy: makeMove %.1fx  pins %.1fx" % (totals['deepcopy'] / totals['makeMove'], totals['deepcopy'] / totals['pins']))
+
+# bytes allocated by a deepcopy of a board after some moves, and deepcopies per second
+def benchmarkBoardMemory(copies):
+    myBoard = gameBoard()
+    rand = random.Random(0)
+    for ply in range(10):
+        moves = myBoard.getLegalMoves()
+        move = rand.choice(moves)
+        myBoard.playMove(move[0], move[1], move[2] or "Q")
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    board = copy.deepcopy(myBoard.board)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    pieces = sum(1 for i in board for j in i if j is not None)
+
+    start = time.perf_counter()
+    for i in range(copies):
+        copy.deepcopy(myBoard.board)
+    elapsed = time.perf_counter() - start
+
+    print("pieces:", pieces)
+    print("bytes/board: %d  bytes/piece: %.0f" % (size, size / pieces))
+    print("copies/s: %.1f  ms/copy: %.3f" % (copies / elapsed, 1000 * elapsed / copies))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "memory":
+        copies = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        benchmarkBoardMemory(copies)
+    else:
+        games = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+        plies = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+        benchmarkLegalMoves(games, plies)
@@ -0,0 +1,374 @@
+# A compact position built on 64 bit integers, one bit per square.
+# square = y * 8 + x, the same x and y as gameBoard.board[y][x]
+# Moves are (oldSquare, newSquare, promotion) tuples,
+# promotion is the chr of the new piece or None
+
+COLORS = ('W', 'B')
+PIECE_CHRS = ('P', 'N', 'B', 'R', 'Q', 'K')
+
+# index into bitboardPosition.pieces, by (color, pieceChr)
+PIECE_INDEX = {}
+for colorIndex in range(2):
+    for chrIndex in range(6):
+        PIECE_INDEX[(COLORS[colorIndex], PIECE_CHRS[chrIndex])] = colorIndex * 6 + chrIndex
+
+OTHER_COLOR = {'W': 'B', 'B': 'W'}
+
+# Castling rights
+# kingside rooks start on x = 0, and the king castles to x = 1
+# queenside rooks start on x = 7, and the king castles to x = 5
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+ALL_CASTLING = 15
+
+KING_START = {'W': 3, 'B': 59}
+# rights lost when a piece leaves or arrives on a square
+CASTLING_LOST = [0] * 64
+CASTLING_LOST[3] = WHITE_KINGSIDE | WHITE_QUEENSIDE
+CASTLING_LOST[0] = WHITE_KINGSIDE
+CASTLING_LOST[7] = WHITE_QUEENSIDE
+CASTLING_LOST[59] = BLACK_KINGSIDE | BLACK_QUEENSIDE
+CASTLING_LOST[56] = BLACK_KINGSIDE
+CASTLING_LOST[63] = BLACK_QUEENSIDE
+
+# right, king destination, rook origin, rook destination, squares that must be empty
+CASTLES = {'W': [(WHITE_KINGSIDE, 1, 0, 2, (1, 2)), (WHITE_QUEENSIDE, 5, 7, 4, (4, 5, 6))],
+           'B': [(BLACK_KINGSIDE, 57, 56, 58, (57, 58)), (BLACK_QUEENSIDE, 61, 63, 60, (60, 61, 62))]}
+
+PROMOTION_CHRS = ('Q', 'R', 'B', 'N')
+
+def square(x, y):
+    return y * 8 + x
+
+def squareCoords(sq):
+    return [sq % 8, sq // 8]
+
+# yields the square of every set bit
+def iterateBits(bits):
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+# Attack tables for pieces that jump, built once at import
+def buildLeaperAttacks(offsets):
+    table = []
+    for sq in range(64):
+        x, y = sq % 8, sq // 8
+        attacks = 0
+        for offset in offsets:
+            if 0 <= x + offset[0] <= 7 and 0 <= y + offset[1] <= 7:
+                attacks |= 1 << square(x + offset[0], y + offset[1])
+        table.append(attacks)
+    return table
+
+KNIGHT_ATTACKS = buildLeaperAttacks(((1,2), (-1,2), (1,-2), (-1,-2), (2,1), (2,-1), (-2,1), (-2,-1)))
+KING_ATTACKS = buildLeaperAttacks(((0,-1), (1,-1), (1,0), (1,1), (0,1), (-1,1), (-1,0), (-1,-1)))
+# white pawns take towards y + 1, black pawns towards y - 1
+PAWN_ATTACKS = {'W': buildLeaperAttacks(((1,1), (-1,1))),
+                'B': buildLeaperAttacks(((1,-1), (-1,-1)))}
+
+# Rays for sliding pieces, RAYS[direction][square] excludes the square itself
+DIRECTIONS = ((0,1), (0,-1), (1,0), (-1,0), (1,1), (1,-1), (-1,1), (-1,-1))
+ROOK_DIRECTIONS = (0, 1, 2, 3)
+BISHOP_DIRECTIONS = (4, 5, 6, 7)
+# rays whose squares get bigger, their first blocker is the lowest bit
+POSITIVE_DIRECTIONS = [direction[1] > 0 or (direction[1] == 0 and direction[0] > 0) for direction in DIRECTIONS]
+
+def buildRays(direction):
+    table = []
+    for sq in range(64):
+        x, y = sq % 8 + direction[0], sq // 8 + direction[1]
+        ray = 0
+        while 0 <= x <= 7 and 0 <= y <= 7:
+            ray |= 1 << square(x, y)
+            x, y = x + direction[0], y + direction[1]
+        table.append(ray)
+    return table
+
+RAYS = [buildRays(direction) for direction in DIRECTIONS]
+
+# squares a sliding piece on sq sees, up to and including the first blocker
+def slidingAttacks(sq, occupied, directions):
+    attacks = 0
+    for direction in directions:
+        ray = RAYS[direction][sq]
+        blockers = ray & occupied
+        if blockers:
+            if POSITIVE_DIRECTIONS[direction]:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= RAYS[direction][blocker]
+        attacks |= ray
+    return attacks
+
+def rookAttacks(sq, occupied):
+    return slidingAttacks(sq, occupied, ROOK_DIRECTIONS)
+
+def bishopAttacks(sq, occupied):
+    return slidingAttacks(sq, occupied, BISHOP_DIRECTIONS)
+
+def queenAttacks(sq, occupied):
+    return slidingAttacks(sq, occupied, ROOK_DIRECTIONS) | slidingAttacks(sq, occupied, BISHOP_DIRECTIONS)
+
+SLIDER_ATTACKS = {'B': bishopAttacks, 'R': rookAttacks, 'Q': queenAttacks}
+
+# One position: 12 piece bitboards, occupancy per side,
+# side to move, castling rights and the en passant square
+class bitboardPosition(object):
+    def __init__(self):
+        self.pieces = [0] * 12
+        self.occupied = {'W': 0, 'B': 0}
+        self.turn = 'W'
+        self.castling = 0
+        # the square a pawn can move to when taking en passant, or None
+        self.enPassant = None
+
+    def copy(self):
+        position = bitboardPosition()
+        position.pieces = self.pieces[:]
+        position.occupied = {'W': self.occupied['W'], 'B': self.occupied['B']}
+        position.turn = self.turn
+        position.castling = self.castling
+        position.enPassant = self.enPassant
+        return position
+
+    def setPiece(self, sq, color, pieceChr):
+        self.pieces[PIECE_INDEX[(color, pieceChr)]] |= 1 << sq
+        self.occupied[color] |= 1 << sq
+
+    def removePiece(self, sq, color, pieceChr):
+        self.pieces[PIECE_INDEX[(color, pieceChr)]] &= ~(1 << sq)
+        self.occupied[color] &= ~(1 << sq)
+
+    # returns (color, pieceChr) of the piece on sq, or None
+    def pieceAt(self, sq):
+        bit = 1 << sq
+        for color in COLORS:
+            if self.occupied[color] & bit:
+                for pieceChr in PIECE_CHRS:
+                    if self.pieces[PIECE_INDEX[(color, pieceChr)]] & bit:
+                        return (color, pieceChr)
+        return None
+
+    def getBitboard(self, color, pieceChr):
+        return self.pieces[PIECE_INDEX[(color, pieceChr)]]
+
+    def kingSquare(self, color):
+        return self.getBitboard(color, 'K').bit_length() - 1
+
+    # returns True if a piece of color attacks sq
+    def isSquareAttacked(self, sq, color):
+        occupied = self.occupied['W'] | self.occupied['B']
+        if KNIGHT_ATTACKS[sq] & self.getBitboard(color, 'N'):
+            return True
+        if KING_ATTACKS[sq] & self.getBitboard(color, 'K'):
+            return True
+        # a pawn of color attacks sq if a pawn of the other color on sq would attack it
+        if PAWN_ATTACKS[OTHER_COLOR[color]][sq] & self.getBitboard(color, 'P'):
+            return True
+        queens = self.getBitboard(color, 'Q')
+        if rookAttacks(sq, occupied) & (self.getBitboard(color, 'R') | queens):
+            return True
+        if bishopAttacks(sq, occupied) & (self.getBitboard(color, 'B') | queens):
+            return True
+        return False
+
+    def inCheck(self, color):
+        return self.isSquareAttacked(self.kingSquare(color), OTHER_COLOR[color])
+
+    # Moves for the side to move, ignoring whether they leave the king in check
+    # Castling only needs the right and empty squares between king and rook,
+    # the same as king.truncateLineOfSights
+    def pseudoLegalMoves(self):
+        color = self.turn
+        own = self.occupied[color]
+        enemy = self.occupied[OTHER_COLOR[color]]
+        occupied = own | enemy
+        moves = []
+
+        # pawns
+        if color == 'W':
+            step, startRank, lastRank = 8, 1, 7
+        else:
+            step, startRank, lastRank = -8, 6, 0
+        enPassantBit = 0
+        if self.enPassant is not None:
+            enPassantBit = 1 << self.enPassant
+        for oldSquare in iterateBits(self.getBitboard(color, 'P')):
+            targets = PAWN_ATTACKS[color][oldSquare] & (enemy | enPassantBit)
+            newSquare = oldSquare + step
+            if 0 <= newSquare <= 63 and not (occupied >> newSquare) & 1:
+                targets |= 1 << newSquare
+                if oldSquare // 8 == startRank and not (occupied >> (newSquare + step)) & 1:
+                    targets |= 1 << (newSquare + step)
+            for newSquare in iterateBits(targets):
+                if newSquare // 8 == lastRank:
+                    for promotion in PROMOTION_CHRS:
+                        moves.append((oldSquare, newSquare, promotion))
+                else:
+                    moves.append((oldSquare, newSquare, None))
+
+        # knights and sliding pieces
+        for oldSquare in iterateBits(self.getBitboard(color, 'N')):
+            for newSquare in iterateBits(KNIGHT_ATTACKS[oldSquare] & ~own):
+                moves.append((oldSquare, newSquare, None))
+        for pieceChr in ('B', 'R', 'Q'):
+            attacks = SLIDER_ATTACKS[pieceChr]
+            for oldSquare in iterateBits(self.getBitboard(color, pieceChr)):
+                for newSquare in iterateBits(attacks(oldSquare, occupied) & ~own):
+                    moves.append((oldSquare, newSquare, None))
+
+        # king, including castling
+        for oldSquare in iterateBits(self.getBitboard(color, 'K')):
+            for newSquare in iterateBits(KING_ATTACKS[oldSquare] & ~own):
+                moves.append((oldSquare, newSquare, None))
+            for right, kingSquare, rookSquare, rookNewSquare, between in CASTLES[color]:
+                if self.castling & right:
+                    if all(not (occupied >> sq) & 1 for sq in between):
+                        moves.append((oldSquare, kingSquare, None))
+        return moves
+
+    # returns a new position with move played, self is unchanged
+    def afterMove(self, move):
+        oldSquare, newSquare, promotion = move
+        color = self.turn
+        other = OTHER_COLOR[color]
+        movedChr = self.pieceAt(oldSquare)[1]
+        position = self.copy()
+
+        captured = position.pieceAt(newSquare)
+        if captured is not None:
+            position.removePiece(newSquare, captured[0], captured[1])
+        position.removePiece(oldSquare, color, movedChr)
+        if promotion is not None:
+            position.setPiece(newSquare, color, promotion)
+        else:
+            position.setPiece(newSquare, color, movedChr)
+
+        position.enPassant = None
+        if movedChr == 'P':
+            if newSquare == self.enPassant:
+                # the taken pawn is beside the pawn that took it
+                position.removePiece(newSquare - 8 if color == 'W' else newSquare + 8, other, 'P')
+            elif abs(newSquare - oldSquare) == 16:
+                position.enPassant = (oldSquare + newSquare) // 2
+        elif movedChr == 'K' and abs(newSquare - oldSquare) == 2:
+            for right, kingSquare, rookSquare, rookNewSquare, between in CASTLES[color]:
+                if kingSquare == newSquare:
+                    position.removePiece(rookSquare, color, 'R')
+                    position.setPiece(rookNewSquare, color, 'R')
+
+        position.castling &= ~(CASTLING_LOST[oldSquare] | CASTLING_LOST[newSquare])
+        position.turn = other
+        return position
+
+    # Moves for the side to move that do not leave its king in check
+    def legalMoves(self):
+        moves = []
+        for move in self.pseudoLegalMoves():
+            if not self.afterMove(move).inCheck(self.turn):
+                moves.append(move)
+        return moves
+
+# FEN, the usual one line text of a position
+# files run a to h, which is x = 7 down to x = 0
+FILES = 'hgfedcba'
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+FEN_CASTLING = (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE), ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE))
+
+def squareName(sq):
+    return FILES[sq % 8] + str(sq // 8 + 1)
+
+def nameSquare(name):
+    if len(name) != 2 or name[0] not in FILES or name[1] not in '12345678':
+        raise ValueError("Bad square: " + name)
+    return square(FILES.index(name[0]), int(name[1]) - 1)
+
+# Returns (bitboardPosition, halfmove clock, fullmove number) read from fen
+# Raises ValueError if fen cannot be read, or is not a position a game can reach:
+# each side needs one king and the side not to move cannot be in check
+def fromFen(fen):
+    fields = fen.split()
+    if len(fields) == 4:
+        fields += ['0', '1']
+    if len(fields) != 6:
+        raise ValueError("FEN needs 6 fields: " + fen)
+    placement, turn, castling, enPassant, halfmoveClock, fullmoveNumber = fields
+    position = bitboardPosition()
+
+    ranks = placement.split('/')
+    if len(ranks) != 8:
+        raise ValueError("FEN needs 8 ranks: " + fen)
+    for rankIndex in range(8):
+        y = 7 - rankIndex
+        x = 7
+        for character in ranks[rankIndex]:
+            if character.isdigit():
+                x -= int(character)
+            elif character.upper() in PIECE_CHRS and x >= 0:
+                color = 'W' if character.isupper() else 'B'
+                position.setPiece(square(x, y), color, character.upper())
+                x -= 1
+            else:
+                raise ValueError("Bad rank in FEN: " + ranks[rankIndex])
+        if x != -1:
+            raise ValueError("Rank is not 8 squares: " + ranks[rankIndex])
+    for color in COLORS:
+        if bin(position.getBitboard(color, 'K')).count('1') != 1:
+            raise ValueError("FEN needs one king of each color: " + fen)
+
+    if turn not in ('w', 'b'):
+        raise ValueError("Bad side to move: " + turn)
+    position.turn = turn.upper()
+    # the side that has just moved cannot have left its king in check
+    if position.inCheck(OTHER_COLOR[position.turn]):
+        raise ValueError("The side not to move is in check: " + fen)
+
+    if castling != '-':
+        for character in castling:
+            rights = [right for fenChr, right in FEN_CASTLING if fenChr == character]
+            if not rights:
+                raise ValueError("Bad castling rights: " + castling)
+            position.castling |= rights[0]
+
+    if enPassant != '-':
+        sq = nameSquare(enPassant)
+        # the pawn that passed over sq must be in front of it
+        if position.turn == 'W':
+            pawnSquare, color = sq - 8, 'B'
+        else:
+            pawnSquare, color = sq + 8, 'W'
+        if not 0 <= pawnSquare <= 63 or not (position.getBitboard(color, 'P') >> pawnSquare) & 1:
+            raise ValueError("No pawn to take en passant: " + enPassant)
+        position.enPassant = sq
+
+    if not halfmoveClock.isdigit() or not fullmoveNumber.isdigit():
+        raise ValueError("Bad move counters: " + fen)
+    return position, int(halfmoveClock), max(1, int(fullmoveNumber))
+
+def toFen(position, halfmoveClock = 0, fullmoveNumber = 1):
+    ranks = []
+    for y in range(7, -1, -1):
+        rank = ''
+        empty = 0
+        for x in range(7, -1, -1):
+            found = position.pieceAt(square(x, y))
+            if found is None:
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            rank += found[1] if found[0] == 'W' else found[1].lower()
+        if empty:
+            rank += str(empty)
+        ranks.append(rank)
+    castling = ''.join(fenChr for fenChr, right in FEN_CASTLING if position.castling & right) or '-'
+    enPassant = '-'
+    if position.enPassant is not None:
+        enPassant = squareName(position.enPassant)
+    return '%s %s %s %s %d %d' % ('/'.join(ranks), position.turn.lower(), castling, enPassant, halfmoveClock, fullmoveNumber)
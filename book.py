@@ -0,0 +1,152 @@
+import argparse, json, mmap, os, random, struct, sys, time
+from rules import gameBoard, textToMove, packMove, unpackMove, moveToText
+from perft import boardFromMoves
+import pgn
+
+# An opening book: the moves played from positions in earlier games, with how often.
+# The file is a header and then fixed size records of (position key, move, weight),
+# sorted by key, so a position's moves are found by binary search.
+# openingBook reads the file through mmap, so there is nothing to load and
+# processes using the same book share one copy in the page cache.
+# python book.py build book.bin games.pgn games.jsonl --plies 16
+# python book.py probe book.bin --moves e2e4
+
+MAGIC = b'CHSBOOK1'
+# key is gameBoard.key, move is a packed move without its flags
+RECORD = struct.Struct('>QHH')
+MAX_WEIGHT = 65535
+
+# Yields (moves, san) for each game from the start position in files
+# .pgn files are read with pgn.readGames and give SAN moves,
+# other files are selfplay.py JSON lines and give moves such as e2e4
+def readMoveLists(paths):
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as lines:
+            if path.endswith('.pgn'):
+                for game in pgn.readGames(lines):
+                    if 'FEN' not in game['tags']:
+                        yield game['moves'], True
+            else:
+                for line in lines:
+                    if line.strip():
+                        yield json.loads(line)['moves'], False
+
+# Counts the moves played from each position in the first plies of every game
+# Returns {(key, move): count}
+def countBookMoves(paths, plies):
+    counts = {}
+    games = 0
+    for moves, san in readMoveLists(paths):
+        myBoard = gameBoard()
+        for text in moves[:plies]:
+            if san:
+                move = pgn.sanToMove(myBoard, text)
+            else:
+                move = textToMove(text)
+            if move is None or not myBoard.isLegalMove(move[0], move[1]):
+                break
+            packed = packMove(move[0][1] * 8 + move[0][0], move[1][1] * 8 + move[1][0], move[2])
+            counts[(myBoard.key, packed)] = counts.get((myBoard.key, packed), 0) + 1
+            myBoard.playMove(move[0], move[1], move[2] or "Q")
+        games += 1
+    return counts, games
+
+# Writes counts as a book file, leaving out moves played fewer than minCount times
+def writeBook(path, counts, minCount = 1):
+    records = sorted((key, move, min(count, MAX_WEIGHT)) for (key, move), count in counts.items() if count >= minCount)
+    with open(path, 'wb') as output:
+        output.write(MAGIC)
+        for record in records:
+            output.write(RECORD.pack(*record))
+    return len(records)
+
+class openingBook(object):
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = None
+        self.count = 0
+        if size > len(MAGIC):
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.data[:len(MAGIC)] != MAGIC:
+                self.close()
+                raise ValueError("Not a book file: " + path)
+            self.count = (size - len(MAGIC)) // RECORD.size
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+    def keyAt(self, index):
+        return struct.unpack_from('>Q', self.data, len(MAGIC) + index * RECORD.size)[0]
+
+    # Returns [(move, weight)] stored for key, moves are packed without flags
+    def lookup(self, key):
+        if self.data is None:
+            return []
+        # first record whose key is not less than key
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.keyAt(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        entries = []
+        while low < self.count:
+            recordKey, move, weight = RECORD.unpack_from(self.data, len(MAGIC) + low * RECORD.size)
+            if recordKey != key:
+                break
+            entries.append((move, weight))
+            low += 1
+        return entries
+
+    # Returns a legal book move for myBoard's side to move, picked at random by weight,
+    # as [oldCoords, newCoords, promotion], or None if the position is not in the book
+    def chooseMove(self, myBoard, rand = random):
+        entries = []
+        for move, weight in self.lookup(myBoard.key):
+            oldCoords, newCoords, promotion = unpackMove(move)
+            # keys can collide, so the move is checked
+            if myBoard.isLegalMove(oldCoords, newCoords):
+                entries.append(([oldCoords, newCoords, promotion], weight))
+        if len(entries) == 0:
+            return None
+        return rand.choices([entry[0] for entry in entries], [entry[1] for entry in entries])[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or look up an opening book")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a book from games")
+    build.add_argument("book")
+    build.add_argument("games", nargs="+", help=".pgn files, or selfplay.py JSON lines files")
+    build.add_argument("--plies", type=int, default=16, help="plies of each game to take")
+    build.add_argument("--min-count", type=int, default=1, help="times a move must be played to be kept")
+    probe = commands.add_parser("probe", help="show the book moves of a position")
+    probe.add_argument("book")
+    probe.add_argument("--fen", default=None, help="position to look up instead of the usual start")
+    probe.add_argument("--moves", nargs="*", default=[], help="moves from the start position, such as e2e4 e7e5")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        counts, games = countBookMoves(args.games, args.plies)
+        records = writeBook(args.book, counts, args.min_count)
+        elapsed = time.perf_counter() - start
+        print("games: %d  records: %d  bytes: %d  time: %.2f s" % (games, records, os.path.getsize(args.book), elapsed))
+    else:
+        myBoard = boardFromMoves(args.moves, "pins", fen=args.fen)
+        if myBoard is None:
+            sys.exit(1)
+        book = openingBook(args.book)
+        entries = book.lookup(myBoard.key)
+        total = sum(entry[1] for entry in entries)
+        for move, weight in sorted(entries, key=lambda entry: -entry[1]):
+            print("%s %d %.1f%%" % (moveToText(*unpackMove(move)), weight, 100.0 * weight / total))
+        if len(entries) == 0:
+            print("Not in book")
+
+if __name__ == '__main__':
+    main()
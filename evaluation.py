@@ -0,0 +1,201 @@
+import argparse, json, time
+import numpy as np
+from rules import gameBoard, textToMove
+from search import PIECE_VALUES
+
+# A static evaluation made of material, piece-square tables, mobility and king safety,
+# worked out with NumPy for many positions at once.
+# A position is exported from a gameBoard as arrays (see positionArrays),
+# positions are stacked into one array each, and evaluateBatch scores them in one pass.
+# python evaluation.py games.jsonl
+# python evaluation.py games.jsonl --save positions.npz
+
+COLORS = ('W', 'B')
+PIECE_CHRS = ('P', 'N', 'B', 'R', 'Q', 'K')
+# a square holds 0 when empty, 1 to 6 for white P N B R Q K and 7 to 12 for black
+PIECE_CODES = {}
+for colorIndex in range(2):
+    for chrIndex in range(6):
+        PIECE_CODES[(COLORS[colorIndex], PIECE_CHRS[chrIndex])] = 1 + colorIndex * 6 + chrIndex
+
+# Piece-square tables from white's side, rank 8 first and the a file first in each rank
+PIECE_SQUARE_TABLES = {
+    'P': [  0,  0,  0,  0,  0,  0,  0,  0,
+           50, 50, 50, 50, 50, 50, 50, 50,
+           10, 10, 20, 30, 30, 20, 10, 10,
+            5,  5, 10, 25, 25, 10,  5,  5,
+            0,  0,  0, 20, 20,  0,  0,  0,
+            5, -5,-10,  0,  0,-10, -5,  5,
+            5, 10, 10,-20,-20, 10, 10,  5,
+            0,  0,  0,  0,  0,  0,  0,  0],
+    'N': [-50,-40,-30,-30,-30,-30,-40,-50,
+          -40,-20,  0,  0,  0,  0,-20,-40,
+          -30,  0, 10, 15, 15, 10,  0,-30,
+          -30,  5, 15, 20, 20, 15,  5,-30,
+          -30,  0, 15, 20, 20, 15,  0,-30,
+          -30,  5, 10, 15, 15, 10,  5,-30,
+          -40,-20,  0,  5,  5,  0,-20,-40,
+          -50,-40,-30,-30,-30,-30,-40,-50],
+    'B': [-20,-10,-10,-10,-10,-10,-10,-20,
+          -10,  0,  0,  0,  0,  0,  0,-10,
+          -10,  0,  5, 10, 10,  5,  0,-10,
+          -10,  5,  5, 10, 10,  5,  5,-10,
+          -10,  0, 10, 10, 10, 10,  0,-10,
+          -10, 10, 10, 10, 10, 10, 10,-10,
+          -10,  5,  0,  0,  0,  0,  5,-10,
+          -20,-10,-10,-10,-10,-10,-10,-20],
+    'R': [  0,  0,  0,  0,  0,  0,  0,  0,
+            5, 10, 10, 10, 10, 10, 10,  5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+            0,  0,  0,  5,  5,  0,  0,  0],
+    'Q': [-20,-10,-10, -5, -5,-10,-10,-20,
+          -10,  0,  0,  0,  0,  0,  0,-10,
+          -10,  0,  5,  5,  5,  5,  0,-10,
+           -5,  0,  5,  5,  5,  5,  0, -5,
+            0,  0,  5,  5,  5,  5,  0, -5,
+          -10,  5,  5,  5,  5,  5,  0,-10,
+          -10,  0,  5,  0,  0,  0,  0,-10,
+          -20,-10,-10, -5, -5,-10,-10,-20],
+    'K': [-30,-40,-40,-50,-50,-40,-40,-30,
+          -30,-40,-40,-50,-50,-40,-40,-30,
+          -30,-40,-40,-50,-50,-40,-40,-30,
+          -30,-40,-40,-50,-50,-40,-40,-30,
+          -20,-30,-30,-40,-40,-30,-30,-20,
+          -10,-20,-20,-20,-20,-20,-20,-10,
+           20, 20,  0,  0,  0,  0, 20, 20,
+           20, 30, 10,  0,  0, 10, 30, 20]}
+
+MOBILITY_WEIGHT = 4
+# for each pawn of its own in front of the king
+SHIELD_WEIGHT = 12
+# for each enemy knight, bishop, rook or queen within two squares of the king
+KING_ZONE_WEIGHT = 15
+
+# SQUARE_SCORES[code][square] is the material and table score of a piece on a square
+# (square = y * 8 + x), positive for white and negative for black
+def buildSquareScores():
+    scores = np.zeros((13, 64), dtype=np.int32)
+    for (color, pieceChr), code in PIECE_CODES.items():
+        table = PIECE_SQUARE_TABLES[pieceChr]
+        for square in range(64):
+            x, y = square % 8, square // 8
+            # x = 0 is the h file, y = 0 is rank 1
+            if color == 'W':
+                scores[code, square] = PIECE_VALUES[pieceChr] + table[(7 - y) * 8 + (7 - x)]
+            else:
+                scores[code, square] = -(PIECE_VALUES[pieceChr] + table[y * 8 + (7 - x)])
+    return scores
+
+# SHIELD_SQUARES[color][square] marks the three squares in front of a king on square,
+# KING_ZONES[square] the squares within two of it
+def buildKingMasks():
+    shields = np.zeros((2, 64, 64), dtype=bool)
+    zones = np.zeros((64, 64), dtype=bool)
+    for square in range(64):
+        x, y = square % 8, square // 8
+        for colorIndex, step in [(0, 1), (1, -1)]:
+            for shieldX in [x - 1, x, x + 1]:
+                if 0 <= shieldX <= 7 and 0 <= y + step <= 7:
+                    shields[colorIndex, square, (y + step) * 8 + shieldX] = True
+        for other in range(64):
+            if max(abs(other % 8 - x), abs(other // 8 - y)) <= 2:
+                zones[square, other] = True
+    return shields, zones
+
+SQUARE_SCORES = buildSquareScores()
+SHIELD_SQUARES, KING_ZONES = buildKingMasks()
+SQUARES = np.arange(64)
+
+# Returns (pieces, mobility, turn) for a gameBoard:
+# pieces is 64 piece codes, mobility the moves of white and black and turn 0 for white, 1 for black
+# The side to move's mobility counts its trueMoves, the other side's are cleared by gameBoard,
+# so its truncatedLineOfSights are counted instead
+def positionArrays(myBoard):
+    pieces = np.zeros(64, dtype=np.int8)
+    mobility = np.zeros(2, dtype=np.int16)
+    for i in myBoard.board:
+        for j in i:
+            if j is not None:
+                pieces[j.y * 8 + j.x] = PIECE_CODES[(j.color, j.pieceChr)]
+                colorIndex = COLORS.index(j.color)
+                if j.color == myBoard.turn:
+                    mobility[colorIndex] += len(j.trueMoves)
+                else:
+                    mobility[colorIndex] += len(j.truncatedLineOfSights)
+    return pieces, mobility, COLORS.index(myBoard.turn)
+
+# Stacks positionArrays into (N, 64) pieces, (N, 2) mobility and (N,) turn arrays
+def stackPositions(positions):
+    pieces = np.stack([position[0] for position in positions])
+    mobility = np.stack([position[1] for position in positions])
+    turn = np.array([position[2] for position in positions], dtype=np.int8)
+    return pieces, mobility, turn
+
+# King safety of each position for one color, as a (N,) array
+def kingSafety(pieces, colorIndex):
+    ownKing = PIECE_CODES[(COLORS[colorIndex], 'K')]
+    ownPawn = PIECE_CODES[(COLORS[colorIndex], 'P')]
+    enemyCodes = [PIECE_CODES[(COLORS[1 - colorIndex], pieceChr)] for pieceChr in ('N', 'B', 'R', 'Q')]
+    kingSquares = np.argmax(pieces == ownKing, axis=1)
+    shield = ((pieces == ownPawn) & SHIELD_SQUARES[colorIndex][kingSquares]).sum(axis=1)
+    attackers = (np.isin(pieces, enemyCodes) & KING_ZONES[kingSquares]).sum(axis=1)
+    return SHIELD_WEIGHT * shield - KING_ZONE_WEIGHT * attackers
+
+# Scores stacked positions from white's side in one pass, returns a (N,) int32 array
+def evaluateBatch(pieces, mobility):
+    pieces = np.asarray(pieces, dtype=np.intp)
+    mobility = np.asarray(mobility, dtype=np.int32)
+    scores = SQUARE_SCORES[pieces, SQUARES].sum(axis=1)
+    scores += MOBILITY_WEIGHT * (mobility[:, 0] - mobility[:, 1])
+    scores += kingSafety(pieces, 0) - kingSafety(pieces, 1)
+    return scores.astype(np.int32)
+
+# Scores one gameBoard from its side to move's point of view,
+# the same as searchEngine's evaluate
+def evaluate(myBoard):
+    pieces, mobility, turn = positionArrays(myBoard)
+    score = int(evaluateBatch(pieces[None, :], mobility[None, :])[0])
+    if turn == 1:
+        return -score
+    return score
+
+# Yields positionArrays for every position of the games in a selfplay.py JSON lines file
+def positionsFromGames(path):
+    with open(path) as lines:
+        for line in lines:
+            if not line.strip():
+                continue
+            myBoard = gameBoard()
+            yield positionArrays(myBoard)
+            for text in json.loads(line)['moves']:
+                move = textToMove(text)
+                myBoard.playMove(move[0], move[1], move[2] or "Q")
+                yield positionArrays(myBoard)
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every position of self-play games in one batch")
+    parser.add_argument("games", help="JSON lines file from selfplay.py")
+    parser.add_argument("--save", default=None, help="also save the stacked arrays to this .npz file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    pieces, mobility, turn = stackPositions(list(positionsFromGames(args.games)))
+    exported = time.perf_counter() - start
+    if args.save is not None:
+        np.savez_compressed(args.save, pieces=pieces, mobility=mobility, turn=turn)
+
+    start = time.perf_counter()
+    scores = evaluateBatch(pieces, mobility)
+    scored = time.perf_counter() - start
+
+    print("positions: %d" % len(scores))
+    print("export: %.2f s  %.0f positions/s" % (exported, len(scores) / exported))
+    print("score:  %.4f s  %.0f positions/s" % (scored, len(scores) / scored if scored > 0 else 0))
+    print("mean score %.1f, white ahead in %.1f%% of positions" % (scores.mean(), 100.0 * (scores > 0).mean()))
+
+if __name__ == '__main__':
+    main()
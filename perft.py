@@ -0,0 +1,103 @@
+import argparse, sys, time
+from rules import gameBoard, moveToText, textToMove
+import profiling
+
+# Counts the leaf nodes of the legal move tree to a given depth, without pygame.
+# Used to check the move generator and to measure its speed.
+# python perft.py 4
+# python perft.py 3 --divide --moves e2e4 e7e5
+# python perft.py 4 --generator bitboard
+# python perft.py 3 --check-sight-lines
+# python perft.py 3 --fen "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1"
+# python perft.py 3 --profile perft.json
+
+# Returns the leaf nodes depth moves below myBoard's position
+# takeBackMove does not restore trueMoves, so the root's are found again at the end
+# and myBoard is left as it was
+def perft(myBoard, depth):
+    nodes = countNodes(myBoard, depth)
+    if depth >= 2:
+        myBoard.updateTrueMoves(myBoard.board)
+    return nodes
+
+# perft without restoring trueMoves, each position's moves are taken before its first move is played
+def countNodes(myBoard, depth):
+    if depth == 0:
+        return 1
+    moves = myBoard.getLegalMoves()
+    # leaf nodes are counted, not played
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        record = myBoard.playMove(move[0], move[1], move[2] or "Q")
+        nodes += countNodes(myBoard, depth - 1)
+        myBoard.takeBackMove(record)
+    return nodes
+
+# Returns [(move text, nodes)] for every root move
+def divide(myBoard, depth):
+    results = []
+    for move in myBoard.getLegalMoves():
+        record = myBoard.playMove(move[0], move[1], move[2] or "Q")
+        results.append((moveToText(move[0], move[1], move[2]), countNodes(myBoard, depth - 1)))
+        myBoard.takeBackMove(record)
+    myBoard.updateTrueMoves(myBoard.board)
+    return results
+
+# Plays moves given as text from the start position, or from fen
+# Returns None if fen cannot be read or one of the moves is not legal
+def boardFromMoves(moveTexts, moveGenerator, sightLineUpdates = "incremental", checkSightLines = False, fen = None):
+    try:
+        myBoard = gameBoard(moveGenerator, sightLineUpdates, checkSightLines, fen=fen)
+    except ValueError as error:
+        print(error)
+        return None
+    for text in moveTexts:
+        move = textToMove(text)
+        legalMoves = myBoard.getLegalMoves()
+        if move[2] is None and [move[0], move[1], "Q"] in legalMoves:
+            move[2] = "Q"
+        if move not in legalMoves:
+            print("Illegal move:", text)
+            return None
+        myBoard.playMove(move[0], move[1], move[2] or "Q")
+    return myBoard
+
+def main():
+    parser = argparse.ArgumentParser(description="Count leaf nodes of the legal move tree")
+    parser.add_argument("depth", type=int)
+    parser.add_argument("--divide", action="store_true", help="show the node count below each root move")
+    parser.add_argument("--generator", default="pins", choices=["pins", "objects", "bitboard"])
+    parser.add_argument("--sight-lines", default="incremental", choices=["incremental", "full"], help="how sight lines follow each move")
+    parser.add_argument("--check-sight-lines", action="store_true", help="compare every incremental update with a full recompute")
+    parser.add_argument("--fen", default=None, help="position to start from instead of the usual one")
+    parser.add_argument("--moves", nargs="*", default=[], help="moves from the start position, such as e2e4 e7e5")
+    parser.add_argument("--profile", default=None, help="time the stages of each move and write them to this JSON file")
+    args = parser.parse_args()
+    if args.profile is not None:
+        profiling.enable()
+
+    myBoard = boardFromMoves(args.moves, args.generator, args.sight_lines, args.check_sight_lines, args.fen)
+    if myBoard is None:
+        sys.exit(1)
+
+    start = time.perf_counter()
+    if args.divide:
+        results = divide(myBoard, args.depth)
+        for text, nodes in sorted(results):
+            print("%s: %d" % (text, nodes))
+        nodes = sum(result[1] for result in results)
+    else:
+        nodes = perft(myBoard, args.depth)
+    elapsed = time.perf_counter() - start
+
+    print("Nodes searched:", nodes)
+    print("Time: %.3f s" % elapsed)
+    if elapsed > 0:
+        print("Nodes/s: %.0f" % (nodes / elapsed))
+    if args.profile is not None:
+        profiling.exportJson(args.profile)
+
+if __name__ == '__main__':
+    main()
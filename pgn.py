@@ -0,0 +1,230 @@
+import argparse, re, sys, time
+from rules import gameBoard, coordsToName
+import bitboard
+
+# Reads and writes games in PGN, with moves in standard algebraic notation (SAN).
+# readGames streams games from a file one at a time, so a file of any size
+# is read with the memory of one game.
+# python pgn.py games.pgn
+# python pgn.py games.pgn --limit 1000
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+# a move number, such as 12. or 12...
+MOVE_NUMBER = re.compile(r'\d+\.+')
+TAG_ORDER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+
+# SAN of move before it is played, without + or #
+# legalMoves are the side to move's, used to tell apart pieces that can reach the same square
+def moveToSan(myBoard, move, legalMoves):
+    oldCoords, newCoords, promotion = move
+    movedPiece = myBoard.board[oldCoords[1]][oldCoords[0]]
+    pieceChr = movedPiece.getChr()
+    capture = myBoard.board[newCoords[1]][newCoords[0]] is not None
+    if pieceChr == 'K' and abs(oldCoords[0] - newCoords[0]) == 2:
+        # the king castles to x = 1 on the kingside, x = 5 on the queenside
+        if newCoords[0] == 1:
+            return 'O-O'
+        return 'O-O-O'
+    if pieceChr == 'P':
+        san = ''
+        if oldCoords[0] != newCoords[0]:
+            san = coordsToName(oldCoords)[0] + 'x'
+        san += coordsToName(newCoords)
+        if promotion is not None:
+            san += '=' + promotion
+        return san
+
+    # other pieces of the same kind that can reach newCoords
+    rivals = []
+    for other in legalMoves:
+        if other[1] == newCoords and other[0] != oldCoords:
+            if myBoard.board[other[0][1]][other[0][0]].getChr() == pieceChr:
+                rivals.append(other[0])
+    san = pieceChr
+    if rivals:
+        if all(rival[0] != oldCoords[0] for rival in rivals):
+            san += coordsToName(oldCoords)[0]
+        elif all(rival[1] != oldCoords[1] for rival in rivals):
+            san += coordsToName(oldCoords)[1]
+        else:
+            san += coordsToName(oldCoords)
+    if capture:
+        san += 'x'
+    return san + coordsToName(newCoords)
+
+# + or # for the position after a move, once the move is played
+def checkSuffix(myBoard):
+    if not myBoard.evalInCheck(myBoard.board, myBoard.turn):
+        return ''
+    if len(myBoard.getLegalMoves()) == 0:
+        return '#'
+    return '+'
+
+# Returns the legal move [oldCoords, newCoords, promotion] san stands for, or None
+def sanToMove(myBoard, san):
+    san = san.rstrip('+#!?').replace('0-0-0', 'O-O-O').replace('0-0', 'O-O')
+    legalMoves = myBoard.getLegalMoves()
+    # only moves to the square san ends on are written out to compare
+    destination = san.split('=')[0][-2:]
+    for move in legalMoves:
+        if san.startswith('O-O') or coordsToName(move[1]) == destination:
+            if moveToSan(myBoard, move, legalMoves) == san:
+                return move
+    # e8Q and exd8Q leave out the =, and some files write exd6e.p. for en passant
+    if san.endswith('e.p.'):
+        return sanToMove(myBoard, san[:-4])
+    if len(san) > 2 and san[-1] in 'QRBN' and san[-2] != '=':
+        return sanToMove(myBoard, san[:-1] + '=' + san[-1])
+    return None
+
+# Returns myBoard's moves since its start position as PGN text
+# tags are extra or replacement tags, such as {'White': 'me'}
+def gameToPgn(myBoard, tags = None):
+    allTags = {'Event': '?', 'Site': '?', 'Date': '????.??.??', 'Round': '?',
+               'White': '?', 'Black': '?', 'Result': myBoard.getResult(myBoard.getGameStatus())}
+    if myBoard.startFen != bitboard.START_FEN:
+        allTags['SetUp'] = '1'
+        allTags['FEN'] = myBoard.startFen
+    if tags is not None:
+        allTags.update(tags)
+    names = list(TAG_ORDER) + sorted(name for name in allTags if name not in TAG_ORDER)
+    lines = ['[%s "%s"]' % (name, allTags[name].replace('\\', '\\\\').replace('"', '\\"')) for name in names]
+
+    # the moves are played again from the start to write them in SAN
+    replay = gameBoard(fen=myBoard.startFen)
+    words = []
+    for move in myBoard.getMoveHistory():
+        if replay.turn == 'W':
+            words.append('%d.' % replay.fullmoveNumber)
+        elif len(words) == 0:
+            words.append('%d...' % replay.fullmoveNumber)
+        san = moveToSan(replay, move, replay.getLegalMoves())
+        replay.playMove(move[0], move[1], move[2] or "Q")
+        words.append(san + checkSuffix(replay))
+    words.append(allTags['Result'])
+
+    # movetext lines are kept under 80 characters
+    movetext = []
+    line = ''
+    for word in words:
+        if line and len(line) + 1 + len(word) > 79:
+            movetext.append(line)
+            line = word
+        else:
+            line = (line + ' ' + word).strip()
+    movetext.append(line)
+    return '\n'.join(lines) + '\n\n' + '\n'.join(movetext) + '\n'
+
+# Yields {'tags': {...}, 'moves': [san, ...], 'result': ...} for each game in lines,
+# such as an open file, reading one line at a time
+# Comments, variations and annotations are skipped
+def readGames(lines):
+    tags = {}
+    moves = []
+    result = None
+    commentDepth = 0
+    variationDepth = 0
+    for line in lines:
+        line = line.strip()
+        if commentDepth == 0 and variationDepth == 0:
+            if line.startswith('%'):
+                continue
+            if line.startswith('['):
+                # a tag after moves starts the next game
+                if moves or result is not None:
+                    yield {'tags': tags, 'moves': moves, 'result': result or '*'}
+                    tags, moves, result = {}, [], None
+                tag = parseTag(line)
+                if tag is not None:
+                    tags[tag[0]] = tag[1]
+                continue
+        for token in tokenize(line):
+            if commentDepth:
+                if token == '}':
+                    commentDepth = 0
+                continue
+            if token == '{':
+                commentDepth = 1
+            elif token == ';':
+                break
+            elif token == '(':
+                variationDepth += 1
+            elif token == ')':
+                variationDepth = max(0, variationDepth - 1)
+            elif variationDepth:
+                continue
+            elif token in RESULTS:
+                result = token
+                yield {'tags': tags, 'moves': moves, 'result': result}
+                tags, moves, result = {}, [], None
+            elif token.startswith('$'):
+                # annotations
+                continue
+            else:
+                # move numbers, which may be joined to the move as in 1.e4 or 3...Nf6
+                # castling written with zeros, 0-0, has no dot and is kept
+                number = MOVE_NUMBER.match(token)
+                if number is not None:
+                    token = token[number.end():]
+                if token:
+                    moves.append(token)
+    if moves or tags:
+        yield {'tags': tags, 'moves': moves, 'result': result or '*'}
+
+# Splits a line of movetext into words, with { } ( ) ; as words of their own
+def tokenize(line):
+    for character in '{}();':
+        line = line.replace(character, ' ' + character + ' ')
+    return line.split()
+
+# Returns (name, value) of a tag line such as [White "Someone"], or None
+def parseTag(line):
+    line = line.strip()[1:-1].strip()
+    name, space, value = line.partition(' ')
+    value = value.strip()
+    if not name or len(value) < 2 or value[0] != '"' or value[-1] != '"':
+        return None
+    return (name, value[1:-1].replace('\\"', '"').replace('\\\\', '\\'))
+
+# Plays a game from readGames on a new gameBoard, checking each move is legal
+# Returns the gameBoard, or raises ValueError naming the first move that is not
+def replayGame(game):
+    myBoard = gameBoard(fen=game['tags'].get('FEN'))
+    for san in game['moves']:
+        move = sanToMove(myBoard, san)
+        if move is None:
+            raise ValueError("Illegal move %s at move %d" % (san, myBoard.fullmoveNumber))
+        myBoard.playMove(move[0], move[1], move[2] or "Q")
+    return myBoard
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the games in a PGN file, checking every move")
+    parser.add_argument("file")
+    parser.add_argument("--limit", type=int, default=None, help="games to read")
+    args = parser.parse_args()
+
+    games = 0
+    plies = 0
+    errors = 0
+    start = time.perf_counter()
+    with open(args.file, encoding="utf-8", errors="replace") as lines:
+        for game in readGames(lines):
+            if args.limit is not None and games >= args.limit:
+                break
+            games += 1
+            try:
+                replayGame(game)
+                plies += len(game['moves'])
+            except ValueError as error:
+                errors += 1
+                print("Game %d: %s" % (games, error))
+    elapsed = time.perf_counter() - start
+
+    print("games: %d  plies: %d  errors: %d  time: %.2f s" % (games, plies, errors, elapsed))
+    if elapsed > 0:
+        print("games/s: %.2f  plies/s: %.0f" % (games / elapsed, plies / elapsed))
+    if errors:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
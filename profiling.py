@@ -0,0 +1,86 @@
+import json, os, time
+
+# Counters and timers for the stages of a move in the rules engine.
+# Profiling is off unless the CHESS_PROFILE environment variable is set (to anything but 0)
+# or enable() is called. While it is off the registered methods are the plain ones,
+# and counting costs one check of profiling.enabled.
+# CHESS_PROFILE=1 python perft.py 3 --profile perft.json
+
+ENVIRONMENT_VARIABLE = 'CHESS_PROFILE'
+# counters are also given per move, counted by this counter
+MOVE_COUNTER = 'movesMade'
+
+enabled = False
+# name: [calls, seconds]
+timers = {}
+# name: count
+counters = {}
+# (owner, name, function) of every method that is timed while profiling is on
+registered = []
+
+def timed(name, function):
+    def timedFunction(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timer = timers.get(name)
+            if timer is None:
+                timer = timers[name] = [0, 0.0]
+            timer[0] += 1
+            timer[1] += time.perf_counter() - start
+    return timedFunction
+
+# Times owner's methods named in names while profiling is on
+# Times include the methods they call
+def register(owner, names):
+    for name in names:
+        function = owner.__dict__[name]
+        registered.append((owner, name, function))
+        if enabled:
+            setattr(owner, name, timed(owner.__name__ + '.' + name, function))
+
+def enable():
+    global enabled
+    if enabled:
+        return
+    enabled = True
+    for owner, name, function in registered:
+        setattr(owner, name, timed(owner.__name__ + '.' + name, function))
+
+def disable():
+    global enabled
+    enabled = False
+    for owner, name, function in registered:
+        setattr(owner, name, function)
+
+def reset():
+    timers.clear()
+    counters.clear()
+
+def count(name, amount = 1):
+    counters[name] = counters.get(name, 0) + amount
+
+# Returns the timers and counters as a dict of plain values
+def getStats():
+    stats = {'timers': {}, 'counters': dict(counters), 'perMove': {}}
+    for name, (calls, seconds) in sorted(timers.items(), key=lambda item: -item[1][1]):
+        stats['timers'][name] = {'calls': calls, 'seconds': seconds,
+                                 'microsecondsPerCall': 1000000 * seconds / calls if calls else 0}
+    moves = counters.get(MOVE_COUNTER, 0)
+    if moves:
+        for name, value in counters.items():
+            if name != MOVE_COUNTER:
+                stats['perMove'][name] = value / moves
+    return stats
+
+# Returns getStats as JSON, also written to path if given
+def exportJson(path = None):
+    text = json.dumps(getStats(), indent=2)
+    if path is not None:
+        with open(path, 'w') as output:
+            output.write(text + '\n')
+    return text
+
+if os.environ.get(ENVIRONMENT_VARIABLE, '0') not in ('', '0'):
+    enable()
@@ -0,0 +1,203 @@
+import argparse, gc, json, os, platform, sys, time, tracemalloc
+from rules import gameBoard, textToMove
+from perft import perft
+
+# Benchmarks gameBoard without a window over a fixed corpus, to catch changes that make it slower:
+# legal move generation on opening, middlegame and endgame positions, replaying the games
+# in corpus.jsonl through requestMove, perft at fixed depths and the memory of a board.
+# Perft node counts and a few rules that once went wrong are checked as well.
+# Results are written as JSON, and compared against the results of an earlier run.
+# python regression.py --output baseline.json
+# python regression.py --baseline baseline.json --threshold 0.1
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus.jsonl')
+
+POSITIONS = {
+    'opening': [
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        "r1bqkbnr/pppp1ppp/2n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3",
+        "rnbqkb1r/pp2pppp/3p1n2/8/3NP3/8/PPP2PPP/RNBQKB1R w KQkq - 1 5",
+        "rnbqkb1r/ppp2ppp/4pn2/3p2B1/2PP4/2N5/PP2PPPP/R2QKBNR b KQkq - 3 4"],
+    'middlegame': [
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"],
+    'endgame': [
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1",
+        "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1",
+        "8/8/8/3k4/8/8/2Q1K3/7r w - - 0 1"]}
+
+# fen, depth and the nodes perft must find
+# castling is not checked for passing through attacked squares, so kiwipete finds more than usual
+PERFT_TESTS = {
+    'start': ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", 3, 8902),
+    'kiwipete': ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 2, 2043),
+    'rookEndgame': ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 3, 2812)}
+
+# boards made at once to measure the memory of one
+MEMORY_BOARDS = 50
+
+# The seconds call takes, the least of repeat runs
+# The garbage collector is paused while timing, as timeit does
+def bestTime(call, repeat):
+    best = None
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(repeat):
+            start = time.perf_counter()
+            call()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+    finally:
+        gc.enable()
+    return best
+
+def readCorpus(path):
+    with open(path) as lines:
+        return [json.loads(line)['moves'] for line in lines if line.strip()]
+
+# Positions per second finding trueMoves for each position of fens, rounds times over
+def benchmarkLegalMoves(fens, generator, rounds, repeat):
+    boards = [gameBoard(generator, fen=fen) for fen in fens]
+
+    def run():
+        for i in range(rounds):
+            for myBoard in boards:
+                myBoard.updateTrueMoves(myBoard.board)
+    return rounds * len(boards) / bestTime(run, repeat)
+
+# Moves per second replaying games through requestMove, as the window plays them
+def benchmarkReplay(games, generator, repeat):
+    def run():
+        for moves in games:
+            myBoard = gameBoard(generator)
+            for text in moves:
+                move = textToMove(text)
+                if not myBoard.requestMove(move[0], move[1], move[2] or "Q"):
+                    raise RuntimeError("Corpus move " + text + " is not legal")
+    return sum(len(moves) for moves in games) / bestTime(run, repeat)
+
+# Returns (nodes, nodes per second) of perft from fen
+def benchmarkPerft(fen, depth, generator, repeat):
+    myBoard = gameBoard(generator, fen=fen)
+    result = []
+
+    def run():
+        result.append(perft(myBoard, depth))
+    elapsed = bestTime(run, repeat)
+    return result[0], result[0] / elapsed
+
+# Bytes allocated per gameBoard, made from the start position
+def benchmarkMemory(generator):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    boards = [gameBoard(generator) for i in range(MEMORY_BOARDS)]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size / len(boards)
+
+# Plays moves such as e2e4 on myBoard with playMove
+def playTexts(myBoard, texts):
+    for text in texts:
+        move = textToMove(text)
+        myBoard.playMove(move[0], move[1], move[2] or "Q")
+
+# Checks of rules that once went wrong, returns a message for each that fails
+def checkRules(generator):
+    errors = []
+    # a move played with playMove after undoMove leaves nothing to redo
+    myBoard = gameBoard(generator)
+    playTexts(myBoard, ["e2e4"])
+    myBoard.undoMove()
+    playTexts(myBoard, ["d2d4"])
+    fen = myBoard.getFen()
+    if myBoard.redoMove() or myBoard.getFen() != fen:
+        errors.append("redoMove played a move taken back before another move was played")
+    # positions without one king each, or whose side not to move is in check, are not loaded
+    for fen in ["4k3/7p/8/8/8/8/8/4R1K1 w - - 0 1", "4k3/8/8/8/8/8/8/8 w - - 0 1", "4k3/8/8/8/8/8/8/3KK3 w - - 0 1"]:
+        try:
+            gameBoard(generator, fen=fen)
+            errors.append("FEN was loaded: " + fen)
+        except ValueError:
+            pass
+    return errors
+
+# Runs every benchmark, returns the results as a dict of plain values
+# Each metric has its value, its unit and whether a higher value is better
+def runSuite(generator, repeat, rounds, corpusPath):
+    metrics = {}
+    errors = checkRules(generator)
+
+    def record(name, value, unit, higherIsBetter = True):
+        metrics[name] = {'value': value, 'unit': unit, 'higherIsBetter': higherIsBetter}
+        print("%-24s %14.1f %s" % (name, value, unit))
+
+    for phase, fens in POSITIONS.items():
+        record('legalMoves.' + phase, benchmarkLegalMoves(fens, generator, rounds, repeat), 'positions/s')
+    record('replay', benchmarkReplay(readCorpus(corpusPath), generator, repeat), 'moves/s')
+    for name, (fen, depth, expected) in PERFT_TESTS.items():
+        nodes, speed = benchmarkPerft(fen, depth, generator, repeat)
+        record('perft.' + name, speed, 'nodes/s')
+        if nodes != expected:
+            errors.append("perft %s depth %d found %d nodes, not %d" % (name, depth, nodes, expected))
+    record('memory', benchmarkMemory(generator), 'bytes/board', False)
+    return {'generator': generator, 'repeat': repeat, 'python': platform.python_version(),
+            'machine': platform.machine(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'metrics': metrics, 'errors': errors}
+
+# Returns the names of metrics that are worse than in baseline by more than threshold (0.1 is 10%)
+def compareResults(results, baseline, threshold):
+    regressions = []
+    print("%-24s %14s %14s %8s" % ("metric", "baseline", "now", "change"))
+    for name, metric in results['metrics'].items():
+        old = baseline['metrics'].get(name)
+        if old is None or old['value'] == 0:
+            continue
+        change = metric['value'] / old['value'] - 1
+        if metric['higherIsBetter']:
+            worse = change < -threshold
+        else:
+            worse = change > threshold
+        print("%-24s %14.1f %14.1f %+7.1f%% %s" % (name, old['value'], metric['value'], 100 * change,
+                                                   "REGRESSION" if worse else ""))
+        if worse:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gameBoard over a fixed corpus and compare with a baseline")
+    parser.add_argument("--generator", default="pins", choices=["pins", "objects", "bitboard"])
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each benchmark, the fastest is kept")
+    parser.add_argument("--rounds", type=int, default=200, help="times each position's legal moves are found per run")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="JSON lines file of games to replay")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="how much worse a metric can get, 0.1 is 10%%")
+    args = parser.parse_args()
+
+    results = runSuite(args.generator, args.repeat, args.rounds, args.corpus)
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            output.write(json.dumps(results, indent=2) + '\n')
+
+    failed = False
+    for error in results['errors']:
+        print("Error:", error)
+        failed = True
+    if args.baseline is not None:
+        with open(args.baseline) as baselineFile:
+            baseline = json.load(baselineFile)
+        print()
+        regressions = compareResults(results, baseline, args.threshold)
+        if len(regressions) != 0:
+            print("Regressions:", " ".join(regressions))
+            failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1410 @@
+# The rules of chess, an abstract class piece with a child class for each kind of piece,
+# and gameBoard which holds the pieces and decides which moves are legal.
+# Nothing here needs pygame, Chess.py draws the game.
+
+import bitboard
+import zobrist
+import profiling
+
+# Directions and offsets of each kind of piece, in the order they look
+ROOK_DIRECTIONS = ((0,1), (0,-1), (1,0), (-1,0))
+BISHOP_DIRECTIONS = ((1,1), (1,-1), (-1,1), (-1,-1))
+QUEEN_DIRECTIONS = BISHOP_DIRECTIONS + ROOK_DIRECTIONS
+KNIGHT_OFFSETS = ((1,2), (-1,2), (1,-2), (-1,-2), (2,1), (2,-1), (-2,1), (-2,-1))
+KING_OFFSETS = ((0,-1), (1,-1), (1,0), (1,1), (0,1), (-1,1), (-1,0), (-1,-1))
+
+def isOnBoard(x, y):
+    return x >= 0 and x <= 7 and y >= 0 and y <= 7
+
+# returns the piece at x, y or None, including when x, y is off the board
+def squareAt(board, x, y):
+    if isOnBoard(x, y):
+        return board[y][x]
+    return None
+
+# Squares are named from white's side as in bitboard.py, x = 0 is the h file and y = 0 is rank 1
+def coordsToName(coords):
+    return bitboard.squareName(coords[1] * 8 + coords[0])
+
+# Raises ValueError unless name is a square from a1 to h8
+def nameToCoords(name):
+    square = bitboard.nameSquare(name)
+    return [square % 8, square // 8]
+
+# Moves as text, such as e2e4 or e7e8q for a promotion
+def moveToText(oldCoords, newCoords, promotion = None):
+    text = coordsToName(oldCoords) + coordsToName(newCoords)
+    if promotion is not None:
+        text += promotion.lower()
+    return text
+
+# returns [oldCoords, newCoords, promotion], promotion is None if not given
+# Raises ValueError if either square cannot be read
+def textToMove(text):
+    promotion = None
+    if len(text) == 5:
+        promotion = text[4].upper()
+    return [nameToCoords(text[0:2]), nameToCoords(text[2:4]), promotion]
+
+# Squares are y * 8 + x, SQUARE_COORDS[square] is its [x, y]
+# The lists are shared like the sight line tables below, so must not be changed
+SQUARE_COORDS = [[square % 8, square // 8] for square in range(64)]
+# the mask of every square
+ALL_SQUARES = (1 << 64) - 1
+
+# Returns a mask with the bit of each square in coordsList set
+def squaresMask(coordsList):
+    mask = 0
+    for coords in coordsList:
+        mask |= 1 << (coords[1] * 8 + coords[0])
+    return mask
+
+# Moves packed into an int: bits 0-5 are the old square, bits 6-11 the new square,
+# bits 12-14 the promotion and the flags are above them
+PROMOTION_CHRS = (None, 'N', 'B', 'R', 'Q')
+PROMOTION_CODES = {None: 0, 'N': 1, 'B': 2, 'R': 3, 'Q': 4}
+MOVE_CAPTURE = 1 << 15
+MOVE_EN_PASSANT = 1 << 16
+MOVE_CASTLE = 1 << 17
+MOVE_DOUBLE_PUSH = 1 << 18
+
+def packMove(oldSquare, newSquare, promotion = None, flags = 0):
+    return oldSquare | (newSquare << 6) | (PROMOTION_CODES[promotion] << 12) | flags
+
+def moveFrom(move):
+    return move & 63
+
+def moveTo(move):
+    return (move >> 6) & 63
+
+def movePromotion(move):
+    return PROMOTION_CHRS[(move >> 12) & 7]
+
+# returns [oldCoords, newCoords, promotion]
+def unpackMove(move):
+    return [SQUARE_COORDS[move & 63], SQUARE_COORDS[(move >> 6) & 63], PROMOTION_CHRS[(move >> 12) & 7]]
+
+# Builds the lineOfSightList of a piece for every square, indexed [y][x]
+# A lineOfSight is a tuple of coords, and a move further along it
+# is only possible if the ones before it are
+# (Consider subset forward of a rook, moving forward 6 is only possible
+#  If you can move forward 5)
+# slides follows each direction to the edge, otherwise it takes one step
+def buildLinesOfSight(directions, slides):
+    table = []
+    for y in range(8):
+        row = []
+        for x in range(8):
+            lineOfSightList = []
+            for direction in directions:
+                lineOfSight = []
+                newX = x + direction[0]
+                newY = y + direction[1]
+                while isOnBoard(newX, newY):
+                    lineOfSight.append([newX, newY])
+                    if not slides:
+                        break
+                    newX += direction[0]
+                    newY += direction[1]
+                if len(lineOfSight) != 0:
+                    lineOfSightList.append(tuple(lineOfSight))
+            row.append(tuple(lineOfSightList))
+        table.append(tuple(row))
+    return tuple(table)
+
+# pawns look one square forward, or two before they have moved
+def buildPawnLinesOfSight(step, hasMoved):
+    table = []
+    for y in range(8):
+        row = []
+        for x in range(8):
+            lineOfSight = []
+            for distance in [1, 2]:
+                if isOnBoard(x, y + step * distance) and (distance == 1 or not hasMoved):
+                    lineOfSight.append([x, y + step * distance])
+            if len(lineOfSight) != 0:
+                row.append((tuple(lineOfSight),))
+            else:
+                row.append(())
+        table.append(tuple(row))
+    return tuple(table)
+
+# Built once at import, pieces share these instead of building their own
+ROOK_LINES = buildLinesOfSight(ROOK_DIRECTIONS, True)
+BISHOP_LINES = buildLinesOfSight(BISHOP_DIRECTIONS, True)
+QUEEN_LINES = buildLinesOfSight(QUEEN_DIRECTIONS, True)
+KNIGHT_LINES = buildLinesOfSight(KNIGHT_OFFSETS, False)
+KING_LINES = buildLinesOfSight(KING_OFFSETS, False)
+# PAWN_LINES[color][hasMoved]
+PAWN_LINES = {'W': {False: buildPawnLinesOfSight(1, False), True: buildPawnLinesOfSight(1, True)},
+              'B': {False: buildPawnLinesOfSight(-1, False), True: buildPawnLinesOfSight(-1, True)}}
+
+# abstract class for all chess pieces
+# Pieces keep their attributes in __slots__ rather than a __dict__.
+# What is the same for every piece of a kind is held on its class:
+# pieceChr, linesOfSight (the table its lineOfSightList comes from),
+# and whether it slides straight or diagonally
+class piece(object):
+    __slots__ = ('x', 'y', 'color', 'hasMoved', 'lineOfSightList', 'truncatedLineOfSights', 'truncatedSquares',
+                 'trueMoves', 'trueMoveSquares', 'watchedSquares')
+    pieceChr = None
+    linesOfSight = None
+    slidesStraight = False
+    slidesDiagonally = False
+
+    def __init__(self, x, y, color):
+        self.x = x
+        self.y = y
+        self.color = color
+        self.hasMoved = False
+
+        # A list of lineOfSights, shared from the tables above
+        self.lineOfSightList = ()
+        
+        # Line Of Sights, truncated vision (Also handles castling)
+        self.truncatedLineOfSights = [] 
+        # the same squares as a mask, for checking a square in one step
+        self.truncatedSquares = 0
+
+        # The final list of moves, 
+        # filtered for illegal moves which blunder the king,
+        self.trueMoves = []
+        self.trueMoveSquares = 0
+
+        # Squares (y * 8 + x) the truncatedLineOfSights depend on,
+        # kept by gameBoard when sight lines are updated incrementally
+        self.watchedSquares = []
+        self.updateFreeMoves()
+        
+    def updateFreeMoves(self):
+        self.lineOfSightList = self.linesOfSight[self.y][self.x]
+
+    def getChr(self):
+        return self.pieceChr
+
+    # Copies share the sight line tables and coords lists, which are never changed,
+    # and get lists of their own holding them
+    def __deepcopy__(self, memo):
+        if profiling.enabled:
+            profiling.count('deepcopies')
+        copied = self.__class__.__new__(self.__class__)
+        memo[id(self)] = copied
+        self.copyTo(copied)
+        return copied
+
+    def copyTo(self, copied):
+        copied.x = self.x
+        copied.y = self.y
+        copied.color = self.color
+        copied.hasMoved = self.hasMoved
+        copied.lineOfSightList = self.lineOfSightList
+        copied.truncatedLineOfSights = self.truncatedLineOfSights[:]
+        copied.truncatedSquares = self.truncatedSquares
+        copied.trueMoves = self.trueMoves[:]
+        copied.trueMoveSquares = self.trueMoveSquares
+        copied.watchedSquares = self.watchedSquares[:]
+
+    # the shared SQUARE_COORDS list, not a new one
+    def getCoords(self):
+        return SQUARE_COORDS[self.y * 8 + self.x]
+    
+    def getColor(self):
+        return(self.color)
+
+    # Updates truncatedLineOfSights
+    def truncateLineOfSights(self, board):
+        self.truncatedLineOfSights = self.findTruncatedLineOfSights(board)
+        self.truncatedSquares = squaresMask(self.truncatedLineOfSights)
+
+    # Filters lineOfSightList
+    # Truncates lineOfSights to the first piece seen
+    # Returns the result without storing it, so a simulated board can be
+    # inspected without disturbing the real one
+    def findTruncatedLineOfSights(self, board):
+        truncatedLineOfSights = []
+        for lineOfSight in self.lineOfSightList:
+            for j in range(len(lineOfSight)):
+                rank = lineOfSight[j][1]
+                file = lineOfSight[j][0]
+                if board[rank][file] is not None:
+                    if self.color == board[rank][file].color:
+                        # Same colour piece, end lineOfSight
+                        break
+                    else:
+                        # Different colour piece, take and end lineOfSight
+                        truncatedLineOfSights.append(lineOfSight[j])
+                        break
+                else:
+                    truncatedLineOfSights.append(lineOfSight[j])
+        return truncatedLineOfSights
+
+    # Returns the squares whose contents decide truncatedLineOfSights,
+    # each lineOfSight up to and including the first piece on it
+    def findWatchedSquares(self, board):
+        watchedSquares = []
+        for lineOfSight in self.lineOfSightList:
+            for coords in lineOfSight:
+                watchedSquares.append(coords[1] * 8 + coords[0])
+                if board[coords[1]][coords[0]] is not None:
+                    break
+        return watchedSquares
+
+    #limits truncatedLineOfSights to only legal moves
+    def updateTrueMoves(self, gameBoard, board):
+        trueMoves = []
+        coords = self.getCoords()
+        for i in self.truncatedLineOfSights:
+            if gameBoard.checkLegal(board, coords, i):
+                trueMoves.append(i)
+        self.setTrueMoves(trueMoves)
+
+    def setTrueMoves(self, trueMoves):
+        self.trueMoves = trueMoves
+        self.trueMoveSquares = squaresMask(trueMoves)
+
+    #checks if a piece has a king in sight
+    def validateCheckKing(self, coords):
+        return (self.truncatedSquares >> (coords[1] * 8 + coords[0])) & 1 == 1
+        
+        
+
+class pawn(piece):
+    __slots__ = ('enPassantAble',)
+    pieceChr = 'P'
+    linesOfSight = PAWN_LINES
+
+    def __init__(self, x, y, color):
+        self.enPassantAble = False
+        super().__init__(x, y, color)
+    
+    def updateFreeMoves(self):
+        self.lineOfSightList = PAWN_LINES[self.color][self.hasMoved][self.y][self.x]
+
+    def copyTo(self, copied):
+        super().copyTo(copied)
+        copied.enPassantAble = self.enPassantAble
+
+    def findTruncatedLineOfSights(self,board):
+        truncatedLineOfSights = []
+        for i in self.lineOfSightList:
+            for j in range(len(i)):
+                if board[i[j][1]][i[j][0]] is not None:
+                    break
+                else:
+                    truncatedLineOfSights.append(i[j])
+        #allow taking diagonally
+        if self.getColor() == "W":
+            step = 1
+        else:
+            step = -1
+        if self.y + step >= 0 and self.y + step <= 7:
+            if self.x + 1 >= 0 and self.x + 1 <= 7:
+                if board[self.y + step][self.x + 1] is not None:
+                    if board[self.y + step][self.x + 1].getColor() != self.getColor():
+                        truncatedLineOfSights.append([self.x+1,self.y+step])
+            if self.x - 1 >= 0 and self.x - 1 <= 7:
+                if board[self.y + step][self.x - 1] is not None:
+                    if board[self.y + step][self.x - 1].getColor() != self.getColor():
+                        truncatedLineOfSights.append([self.x - 1,self.y + step])
+        #allow en passant
+        if (self.getColor() == "W" and self.y == 4) or (self.getColor() == "B" and self.y == 3):
+            if self.x + 1 >= 0 and self.x + 1 <= 7:
+                if board[self.y][self.x + 1] is not None:
+                    if board[self.y][self.x + 1].getChr() == "P":
+                        if board[self.y][self.x + 1].enPassantAble == True:
+                            truncatedLineOfSights.append([self.x+1,self.y+step])
+            if self.x - 1 >= 0 and self.x - 1 <= 7:
+                if board[self.y][self.x - 1] is not None:
+                    if board[self.y][self.x - 1].getChr() == "P":
+                        if board[self.y][self.x - 1].enPassantAble == True:
+                            truncatedLineOfSights.append([self.x-1,self.y+step])
+        return truncatedLineOfSights
+
+    # also the squares beside and diagonally forward,
+    # whose pieces decide taking and en passant
+    def findWatchedSquares(self, board):
+        watchedSquares = super().findWatchedSquares(board)
+        if self.getColor() == "W":
+            step = 1
+        else:
+            step = -1
+        for x in [self.x - 1, self.x + 1]:
+            if x >= 0 and x <= 7:
+                watchedSquares.append(self.y * 8 + x)
+                if self.y + step >= 0 and self.y + step <= 7:
+                    watchedSquares.append((self.y + step) * 8 + x)
+        return watchedSquares
+
+    def disableEnPassant(self):
+        self.enPassantAble = False
+    def enableEnPassant(self):
+        self.enPassantAble = True
+
+class rook(piece):
+    __slots__ = ()
+    pieceChr = 'R'
+    linesOfSight = ROOK_LINES
+    slidesStraight = True
+
+class knight(piece):
+    __slots__ = ()
+    pieceChr = 'N'
+    linesOfSight = KNIGHT_LINES
+
+class bishop(piece):
+    __slots__ = ()
+    pieceChr = 'B'
+    linesOfSight = BISHOP_LINES
+    slidesDiagonally = True
+
+class queen(piece):
+    __slots__ = ()
+    pieceChr = 'Q'
+    linesOfSight = QUEEN_LINES
+    slidesStraight = True
+    slidesDiagonally = True
+
+class king(piece):
+    __slots__ = ()
+    pieceChr = 'K'
+    linesOfSight = KING_LINES
+
+    def findTruncatedLineOfSights(self,board):
+        truncatedLineOfSights = super().findTruncatedLineOfSights(board)
+        # enable castling
+        if self.hasMoved == False:
+            if board[self.y][0] is not None:
+                if board[self.y][0].hasMoved == False:
+                    if board[self.y][1] is None and board[self.y][2] is None:
+                        truncatedLineOfSights.append([1,self.y])
+            if board[self.y][7] is not None:
+                if board[self.y][7].hasMoved == False:
+                    if board[self.y][4] is None and board[self.y][5] is None and board[self.y][6] is None:
+                        truncatedLineOfSights.append([5,self.y])
+        return truncatedLineOfSights
+
+    # castling also depends on the rest of the king's rank
+    def findWatchedSquares(self, board):
+        watchedSquares = super().findWatchedSquares(board)
+        if self.hasMoved == False:
+            for x in range(8):
+                if x != self.x:
+                    watchedSquares.append(self.y * 8 + x)
+        return watchedSquares
+
+class gameBoard:
+    # moveGenerator chooses how trueMoves are found,
+    # "pins" finds checks and pins once and only plays out king and en passant moves,
+    # "objects" plays out every move in each piece's sight lines, "bitboard" uses bitboard.py
+    # sightLineUpdates chooses how sight lines follow a move,
+    # "incremental" only recomputes pieces watching a changed square, "full" recomputes all
+    # checkSightLines compares every incremental update against a full recompute
+    # moveCache is an optional zobrist.transpositionTable to reuse trueMoves from
+    # fen starts from a position other than the usual one
+    def __init__(self, moveGenerator = "pins", sightLineUpdates = "incremental", checkSightLines = False, moveCache = None, fen = None):
+        self.moveGenerator = moveGenerator
+        self.sightLineUpdates = sightLineUpdates
+        self.checkSightLines = checkSightLines
+        self.moveCache = moveCache
+        self.board =[
+         [rook(0,0,'W'), knight(1,0,'W'), bishop(2,0,'W'), king(3,0,'W'), queen(4,0,'W'), bishop(5,0,'W'), knight(6,0,'W'), rook(7,0,'W')], 
+         [pawn(x,1,'W') for x in range(8)], 
+         [None, None, None, None, None, None, None, None], 
+         [None, None, None, None, None, None, None, None],
+         [None, None, None, None, None, None, None, None],
+         [None, None, None, None, None, None, None, None],
+         [pawn(x,6,'B') for x in range(8)],
+         [rook(0,7,'B'), knight(1,7,'B'), bishop(2,7,'B'), king(3,7,'B'), queen(4,7,'B'), bishop(5,7,'B'), knight(6,7,'B'), rook(7,7,'B')]
+         ]
+        self.turn = "W"
+        # True while the trueMoves on self.board are those of its position,
+        # a move played or taken back makes them stale until updateTrueMoves
+        self.trueMovesFound = False
+        self.trackKings(self.board)
+        self.resetSightLines()
+        self.resetKey()
+        self.resetHistory()
+        self.updateTrueMoves(self.board)
+        self.gameOver = False
+        if fen is not None:
+            self.loadFen(fen)
+        
+
+    #find all available moves for all pieces
+    def truncateLineOfSights(self, board):
+        for i in board:
+            for j in i:
+                if j is not None:
+                    j.truncateLineOfSights(board)
+        if profiling.enabled:
+            profiling.count('piecesRecomputed', sum(1 for i in board for j in i if j is not None))
+
+    # works out every piece's sight lines on self.board from scratch
+    def resetSightLines(self):
+        if self.sightLineUpdates == "incremental":
+            self.indexSightLines(self.board)
+        else:
+            self.truncateLineOfSights(self.board)
+
+    # Updates sight lines after makeMove or unmakeMove changed board
+    def refreshSightLines(self, board, record):
+        if self.sightLineUpdates == "incremental" and board is self.board:
+            self.updateSightLines(board, record)
+        else:
+            self.truncateLineOfSights(board)
+
+    # Truncates every piece's sight lines and builds self.watchers,
+    # the pieces watching each square (y * 8 + x)
+    def indexSightLines(self, board):
+        self.watchers = [set() for i in range(64)]
+        for i in board:
+            for j in i:
+                if j is not None:
+                    self.watchPiece(board, j)
+
+    def watchPiece(self, board, j):
+        j.truncateLineOfSights(board)
+        j.watchedSquares = j.findWatchedSquares(board)
+        for square in j.watchedSquares:
+            self.watchers[square].add(j)
+
+    def unwatchPiece(self, j):
+        for square in j.watchedSquares:
+            self.watchers[square].discard(j)
+        j.watchedSquares = []
+
+    # Recomputes only the pieces a move affects: those watching a square the move
+    # changed, and those moved, taken or placed by it
+    # Works the same after unmakeMove, which changes the same squares back
+    def updateSightLines(self, board, record):
+        affected = set(record.getPieces())
+        for square in record.getChangedSquares():
+            affected.update(self.watchers[square])
+            if board[square // 8][square % 8] is not None:
+                affected.add(board[square // 8][square % 8])
+        for j in affected:
+            self.unwatchPiece(j)
+            # pieces no longer on the board stop watching
+            if board[j.y][j.x] is j:
+                self.watchPiece(board, j)
+        if profiling.enabled:
+            profiling.count('piecesRecomputed', len(affected))
+        if self.checkSightLines:
+            self.verifySightLines(board)
+
+    # Raises an error if any stored sight lines differ from a full recompute
+    def verifySightLines(self, board):
+        for i in board:
+            for j in i:
+                if j is not None:
+                    if j.truncatedLineOfSights != j.findTruncatedLineOfSights(board) or j.watchedSquares != j.findWatchedSquares(board):
+                        raise RuntimeError("Sight lines of " + j.getColor() + j.getChr() + " on " + coordsToName(j.getCoords()) + " differ from a full recompute")
+        for square in range(64):
+            for j in self.watchers[square]:
+                if board[j.y][j.x] is not j or square not in j.watchedSquares:
+                    raise RuntimeError("Square " + coordsToName([square % 8, square // 8]) + " is watched by a piece that does not see it")
+
+    # only the side to move can use its moves, the other side is cleared
+    def updateTrueMoves(self, board):
+        useCache = self.moveCache is not None and board is self.board
+        if board is self.board:
+            self.trueMovesFound = True
+        if useCache and self.loadCachedTrueMoves(board):
+            return
+        if self.moveGenerator == "bitboard":
+            self.updateTrueMovesFromBitboard(board)
+        elif self.moveGenerator == "pins" and self.getKingCoords(board, self.turn) is not None:
+            self.updateTrueMovesFromPins(board)
+        else:
+            for i in board:
+                for j in i:
+                    if j is not None:
+                        if j.getColor() == self.turn:
+                            j.updateTrueMoves(self, board)
+                        else:
+                            j.setTrueMoves([])
+        if useCache:
+            self.cacheTrueMoves(board)
+
+    # stores the trueMoves of the side to move under the position key
+    def cacheTrueMoves(self, board):
+        trueMoves = {}
+        for i in board:
+            for j in i:
+                if j is not None and j.getColor() == self.turn:
+                    trueMoves[j.y * 8 + j.x] = j.trueMoves
+        self.moveCache.store(self.key, trueMoves)
+
+    # Returns True if the position's trueMoves were in moveCache
+    def loadCachedTrueMoves(self, board):
+        trueMoves = self.moveCache.probe(self.key)
+        if trueMoves is None:
+            return False
+        for i in board:
+            for j in i:
+                if j is not None:
+                    if j.getColor() == self.turn:
+                        j.setTrueMoves(trueMoves[j.y * 8 + j.x])
+                    else:
+                        j.setTrueMoves([])
+        return True
+
+    # Returns (checks, pins) for color's king on board
+    # checks holds a mask for each piece giving check, of its square and the squares between it and the king,
+    # where a move must land to stop that check
+    # pins maps each of color's pieces that shields the king from a slider to the mask of the squares
+    # it can move to, along the line from the king to the slider
+    def findChecksAndPins(self, board, kingCoords, color):
+        x = kingCoords[0]
+        y = kingCoords[1]
+        checks = []
+        pins = {}
+        for lineOfSight in QUEEN_LINES[y][x]:
+            diagonal = lineOfSight[0][0] != x and lineOfSight[0][1] != y
+            mask = 0
+            shield = None
+            for coords in lineOfSight:
+                mask |= 1 << (coords[1] * 8 + coords[0])
+                j = board[coords[1]][coords[0]]
+                if j is None:
+                    continue
+                if j.color == color:
+                    if shield is not None:
+                        break
+                    shield = j
+                    continue
+                if (diagonal and j.slidesDiagonally) or (not diagonal and j.slidesStraight):
+                    if shield is None:
+                        checks.append(mask)
+                    else:
+                        pins[shield] = mask
+                break
+        for lines, pieceChr in [(KNIGHT_LINES, 'N'), (KING_LINES, 'K')]:
+            for lineOfSight in lines[y][x]:
+                j = board[lineOfSight[0][1]][lineOfSight[0][0]]
+                if j is not None and j.color != color and j.pieceChr == pieceChr:
+                    checks.append(1 << (j.y * 8 + j.x))
+        #pawns take diagonally forward, so look diagonally forward from the king
+        if color == 'W':
+            pawnY = y + 1
+        else:
+            pawnY = y - 1
+        for pawnX in [x - 1, x + 1]:
+            j = squareAt(board, pawnX, pawnY)
+            if j is not None and j.color != color and j.pieceChr == 'P':
+                checks.append(1 << (j.y * 8 + j.x))
+        return checks, pins
+
+    # same result as updateTrueMoves, but only king moves and en passant are played out with checkLegal
+    # Other pieces keep the sight line squares that stop every check and stay on their pin line,
+    # in double check that leaves none
+    def updateTrueMovesFromPins(self, board):
+        color = self.turn
+        checks, pins = self.findChecksAndPins(board, self.getKingCoords(board, color), color)
+        allowed = ALL_SQUARES
+        for mask in checks:
+            allowed &= mask
+        for i in board:
+            for j in i:
+                if j is None:
+                    continue
+                if j.color != color:
+                    j.setTrueMoves([])
+                elif j.pieceChr == 'K':
+                    j.updateTrueMoves(self, board)
+                else:
+                    pieceAllowed = allowed
+                    if j in pins:
+                        pieceAllowed &= pins[j]
+                    if j.pieceChr == 'P':
+                        coords = j.getCoords()
+                        trueMoves = []
+                        for k in j.truncatedLineOfSights:
+                            # en passant takes a pawn off another square, so it is played out
+                            if k[0] != j.x and board[k[1]][k[0]] is None:
+                                if self.checkLegal(board, coords, k):
+                                    trueMoves.append(k)
+                            elif (pieceAllowed >> (k[1] * 8 + k[0])) & 1:
+                                trueMoves.append(k)
+                        j.setTrueMoves(trueMoves)
+                    elif pieceAllowed == ALL_SQUARES:
+                        j.trueMoves = j.truncatedLineOfSights[:]
+                        j.trueMoveSquares = j.truncatedSquares
+                    else:
+                        j.trueMoves = [k for k in j.truncatedLineOfSights if (pieceAllowed >> (k[1] * 8 + k[0])) & 1]
+                        j.trueMoveSquares = j.truncatedSquares & pieceAllowed
+
+    # same result as updateTrueMoves, generated on a bitboardPosition
+    def updateTrueMovesFromBitboard(self, board):
+        trueMoves = {}
+        for move in self.toBitboard(board).legalMoves():
+            oldSquare = move[0]
+            newCoords = bitboard.squareCoords(move[1])
+            if oldSquare not in trueMoves:
+                trueMoves[oldSquare] = []
+            # promotions give one move per piece, trueMoves only keeps the square
+            if newCoords not in trueMoves[oldSquare]:
+                trueMoves[oldSquare].append(newCoords)
+        for i in board:
+            for j in i:
+                if j is not None:
+                    j.setTrueMoves(trueMoves.get(bitboard.square(j.x, j.y), []))
+
+    # Returns every legal move for the side to move as [oldCoords, newCoords, promotion]
+    # promotion is None, except for a pawn reaching the last rank,
+    # which gives one move per piece it can become
+    def getLegalMoves(self):
+        return [unpackMove(move) for move in self.getPackedMoves()]
+
+    # The same moves as getLegalMoves, packed into ints with their flags
+    def getPackedMoves(self):
+        moves = []
+        board = self.board
+        for i in board:
+            for j in i:
+                if j is not None and j.getColor() == self.turn:
+                    oldSquare = j.y * 8 + j.x
+                    pieceChr = j.getChr()
+                    for k in j.trueMoves:
+                        newSquare = k[1] * 8 + k[0]
+                        flags = 0
+                        if board[k[1]][k[0]] is not None:
+                            flags = MOVE_CAPTURE
+                        if pieceChr == 'P':
+                            if k[0] != j.x and flags == 0:
+                                flags = MOVE_CAPTURE | MOVE_EN_PASSANT
+                            elif abs(k[1] - j.y) == 2:
+                                flags = MOVE_DOUBLE_PUSH
+                            if k[1] == 0 or k[1] == 7:
+                                for promotion in promotionPieces:
+                                    moves.append(packMove(oldSquare, newSquare, promotion, flags))
+                                continue
+                        elif pieceChr == 'K' and abs(k[0] - j.x) == 2:
+                            flags = MOVE_CASTLE
+                        moves.append(oldSquare | (newSquare << 6) | flags)
+        return moves
+
+    # True if the side to move can play oldCoords to newCoords
+    def isLegalMove(self, oldCoords, newCoords):
+        movedPiece = self.board[oldCoords[1]][oldCoords[0]]
+        if movedPiece is None or movedPiece.getColor() != self.turn:
+            return False
+        return (movedPiece.trueMoveSquares >> (newCoords[1] * 8 + newCoords[0])) & 1 == 1
+
+    # Returns board as a bitboardPosition
+    # castling rights come from hasMoved, en passant from enPassantAble
+    def toBitboard(self, board):
+        position = bitboard.bitboardPosition()
+        position.turn = self.turn
+        for i in board:
+            for j in i:
+                if j is not None:
+                    position.setPiece(bitboard.square(j.x, j.y), j.getColor(), j.getChr())
+                    if j.getChr() == 'P' and j.enPassantAble:
+                        # the square the pawn passed over
+                        if j.getColor() == 'W':
+                            position.enPassant = bitboard.square(j.x, j.y - 1)
+                        else:
+                            position.enPassant = bitboard.square(j.x, j.y + 1)
+        position.castling = self.getCastlingRights(board)
+        return position
+
+    # Returns the castling rights (bitboard.py flags) of both sides,
+    # a right is kept while its king and rook have not moved
+    def getCastlingRights(self, board):
+        rights = 0
+        for color in ['W', 'B']:
+            kingStart = bitboard.KING_START[color]
+            castlingKing = board[kingStart // 8][kingStart % 8]
+            if castlingKing is None or castlingKing.getChr() != 'K' or castlingKing.hasMoved or castlingKing.getColor() != color:
+                continue
+            for right, kingSquare, rookSquare, rookNewSquare, between in bitboard.CASTLES[color]:
+                castlingRook = board[rookSquare // 8][rookSquare % 8]
+                if castlingRook is not None and castlingRook.getChr() == 'R' and not castlingRook.hasMoved:
+                    if castlingRook.getColor() == color:
+                        rights |= right
+        return rights
+
+    # Returns the zobrist key of board with turn to move, worked out from scratch
+    def computeKey(self, board, turn):
+        key = 0
+        for i in board:
+            for j in i:
+                if j is not None:
+                    key ^= zobrist.PIECE_KEYS[(j.getColor(), j.getChr())][j.y * 8 + j.x]
+                    if j.getChr() == 'P' and j.enPassantAble:
+                        key ^= zobrist.EN_PASSANT_KEYS[j.x]
+        key ^= zobrist.CASTLING_KEYS[self.getCastlingRights(board)]
+        if turn == 'B':
+            key ^= zobrist.SIDE_KEY
+        return key
+
+    # Starts the key and the repetition counts from the current position
+    def resetKey(self):
+        self.castlingRights = self.getCastlingRights(self.board)
+        self.key = self.computeKey(self.board, self.turn)
+        self.history = [self.key]
+        self.repetitions = {self.key: 1}
+
+    # Updates self.key for a move makeMove just made on self.board,
+    # including passing the turn to the other side
+    def updateKey(self, record):
+        key = self.key
+        movedPiece = record.movedPiece
+        color = movedPiece.getColor()
+        oldSquare = record.oldCoords[1] * 8 + record.oldCoords[0]
+        newSquare = record.newCoords[1] * 8 + record.newCoords[0]
+        key ^= zobrist.PIECE_KEYS[(color, movedPiece.getChr())][oldSquare]
+        if record.promotedPiece is not None:
+            key ^= zobrist.PIECE_KEYS[(color, record.promotedPiece.getChr())][newSquare]
+        else:
+            key ^= zobrist.PIECE_KEYS[(color, movedPiece.getChr())][newSquare]
+        if record.capturedPiece is not None:
+            capturedSquare = record.capturedCoords[1] * 8 + record.capturedCoords[0]
+            key ^= zobrist.PIECE_KEYS[(record.capturedPiece.getColor(), record.capturedPiece.getChr())][capturedSquare]
+            # a taken pawn leaves the board before clearEnPassant sees it
+            if record.capturedPiece.getChr() == 'P' and record.capturedPiece.enPassantAble:
+                key ^= zobrist.EN_PASSANT_KEYS[record.capturedPiece.x]
+        if record.castlingRook is not None:
+            key ^= zobrist.PIECE_KEYS[(color, 'R')][record.oldCoords[1] * 8 + record.rookOldX]
+            key ^= zobrist.PIECE_KEYS[(color, 'R')][record.oldCoords[1] * 8 + record.rookNewX]
+        for i in record.enPassantPawns:
+            key ^= zobrist.EN_PASSANT_KEYS[i.x]
+        if record.enabledEnPassant:
+            key ^= zobrist.EN_PASSANT_KEYS[record.newCoords[0]]
+        castlingRights = self.getCastlingRights(self.board)
+        key ^= zobrist.CASTLING_KEYS[self.castlingRights] ^ zobrist.CASTLING_KEYS[castlingRights]
+        key ^= zobrist.SIDE_KEY
+        record.key = self.key
+        record.castlingRights = self.castlingRights
+        self.key = key
+        self.castlingRights = castlingRights
+
+    # Counts the position reached as one more occurrence
+    def recordPosition(self):
+        self.history.append(self.key)
+        self.repetitions[self.key] = self.repetitions.get(self.key, 0) + 1
+
+    # positions no longer reached are dropped, so searching does not grow repetitions
+    def forgetPosition(self):
+        key = self.history.pop()
+        if self.repetitions[key] == 1:
+            del self.repetitions[key]
+        else:
+            self.repetitions[key] -= 1
+
+    # True once the current position has been reached three times
+    def isThreefoldRepetition(self):
+        return self.repetitions.get(self.key, 0) >= 3
+
+    # Replaces the board with a bitboardPosition
+    # hasMoved is False only where it matters: pawns on their first rank,
+    # and kings and rooks that can still castle
+    def loadBitboard(self, position):
+        self.board = [[None for x in range(8)] for y in range(8)]
+        self.trueMovesFound = False
+        for sq in range(64):
+            found = position.pieceAt(sq)
+            if found is None:
+                continue
+            color, pieceChr = found
+            x, y = bitboard.squareCoords(sq)
+            newPiece = pieceClasses[pieceChr](x, y, color)
+            newPiece.hasMoved = True
+            if pieceChr == 'P':
+                newPiece.hasMoved = (color == 'W' and y != 1) or (color == 'B' and y != 6)
+            for right, kingSquare, rookSquare, rookNewSquare, between in bitboard.CASTLES[color]:
+                if position.castling & right:
+                    if (pieceChr == 'K' and sq == bitboard.KING_START[color]) or (pieceChr == 'R' and sq == rookSquare):
+                        newPiece.hasMoved = False
+            newPiece.updateFreeMoves()
+            self.board[y][x] = newPiece
+        if position.enPassant is not None:
+            # the pawn that passed over the en passant square
+            x, y = bitboard.squareCoords(position.enPassant)
+            if position.turn == 'W':
+                self.board[y - 1][x].enableEnPassant()
+            else:
+                self.board[y + 1][x].enableEnPassant()
+        self.turn = position.turn
+        self.gameOver = False
+        self.trackKings(self.board)
+        self.resetSightLines()
+        self.resetKey()
+        self.resetHistory()
+        self.updateTrueMoves(self.board)
+
+    # Replaces the board with the position in fen
+    # Raises ValueError if fen cannot be read
+    def loadFen(self, fen):
+        position, halfmoveClock, fullmoveNumber = bitboard.fromFen(fen)
+        self.loadBitboard(position)
+        self.halfmoveClock = halfmoveClock
+        self.fullmoveNumber = fullmoveNumber
+        self.startFen = self.getFen()
+
+    def getFen(self):
+        return bitboard.toFen(self.toBitboard(self.board), self.halfmoveClock, self.fullmoveNumber)
+
+    # Starts the move counters, the material counts and the list of moves played from the current position
+    def resetHistory(self):
+        self.halfmoveClock = 0
+        self.fullmoveNumber = 1
+        self.moveRecords = []
+        # (key, packed move) of the moves taken back by undoMove, the next one to play again last
+        # key is the position the move was taken back to, it is only played again from there
+        self.undoneMoves = []
+        self.startFen = self.getFen()
+        # pieces of each kind by (color, chr), and bishops on light and dark squares
+        self.material = {}
+        for color in ['W', 'B']:
+            for pieceChr in pieceClasses:
+                self.material[(color, pieceChr)] = 0
+        self.bishopSquares = [0, 0]
+        for i in self.board:
+            for j in i:
+                if j is not None:
+                    self.countPiece(j, 1)
+
+    def countPiece(self, j, change):
+        self.material[(j.color, j.pieceChr)] += change
+        if j.pieceChr == 'B':
+            self.bishopSquares[(j.x + j.y) % 2] += change
+
+    # Counts the pieces a move took or promoted, change is 1 for the move and -1 to take it back
+    def countMaterial(self, record, change):
+        if record.capturedPiece is not None:
+            self.countPiece(record.capturedPiece, -change)
+        if record.promotedPiece is not None:
+            self.countPiece(record.movedPiece, -change)
+            self.countPiece(record.promotedPiece, change)
+
+    # Counts a move makeMove just made on self.board
+    def updateHistory(self, record):
+        record.halfmoveClock = self.halfmoveClock
+        if record.movedPiece.getChr() == 'P' or record.capturedPiece is not None:
+            self.halfmoveClock = 0
+        else:
+            self.halfmoveClock += 1
+        if record.movedPiece.getColor() == 'B':
+            self.fullmoveNumber += 1
+        self.countMaterial(record, 1)
+        self.moveRecords.append(record)
+
+    # Returns the moves played since the start position, as [oldCoords, newCoords, promotion]
+    def getMoveHistory(self):
+        moves = []
+        for record in self.moveRecords:
+            promotion = None
+            if record.promotedPiece is not None:
+                promotion = record.promotedPiece.getChr()
+            moves.append([record.oldCoords, record.newCoords, promotion])
+        return moves
+
+    # Returns the packed move (without flags) a moveRecord played
+    def recordToPackedMove(self, record):
+        promotion = None
+        if record.promotedPiece is not None:
+            promotion = record.promotedPiece.getChr()
+        return packMove(record.oldCoords[1] * 8 + record.oldCoords[0], record.newCoords[1] * 8 + record.newCoords[0], promotion)
+
+    # Takes back the last move, keeping it for redoMove
+    # Returns False if there is no move to take back
+    def undoMove(self):
+        if not self.stepBack():
+            return False
+        self.updateTrueMoves(self.board)
+        self.gameOver = self.getGameStatus() is not None
+        return True
+
+    # Plays again the last move undoMove took back
+    # Returns False if there is no move to play again
+    def redoMove(self):
+        if not self.stepForward():
+            return False
+        self.updateTrueMoves(self.board)
+        self.gameOver = self.getGameStatus() is not None
+        return True
+
+    # Takes back or plays again moves until ply moves have been played since the start position,
+    # or as near as the history goes. trueMoves are only found for the position it stops at
+    def goToPly(self, ply):
+        while len(self.moveRecords) > ply and self.stepBack():
+            pass
+        while len(self.moveRecords) < ply and self.stepForward():
+            pass
+        self.updateTrueMoves(self.board)
+        self.gameOver = self.getGameStatus() is not None
+        return len(self.moveRecords)
+
+    # undoMove and redoMove without finding trueMoves
+    def stepBack(self):
+        if len(self.moveRecords) == 0:
+            return False
+        record = self.moveRecords[-1]
+        move = self.recordToPackedMove(record)
+        self.takeBackMove(record)
+        self.undoneMoves.append((self.key, move))
+        return True
+
+    def stepForward(self):
+        if len(self.undoneMoves) == 0:
+            return False
+        # a move played since undoMove, other than through requestMove, leaves them stale
+        if self.undoneMoves[-1][0] != self.key:
+            self.undoneMoves = []
+            return False
+        move = self.undoneMoves.pop()[1]
+        self.applyMove(self.board, SQUARE_COORDS[move & 63], SQUARE_COORDS[(move >> 6) & 63], PROMOTION_CHRS[(move >> 12) & 7] or "Q")
+        if self.turn == 'W': self.turn = 'B'
+        else: self.turn = 'W'
+        self.recordPosition()
+        return True
+
+    #returns the coords of the color of a king   
+    def findKing(self, board, color):
+        for i in board:
+            for j in i:
+                if j is not None:
+                    if j.getChr() == 'K':
+                        if j.getColor() == color:
+                            return j.getCoords()
+
+    #remembers both king pieces, makeMove keeps their coords up to date
+    def trackKings(self, board):
+        self.kings = {}
+        for i in board:
+            for j in i:
+                if j is not None:
+                    if j.getChr() == 'K':
+                        self.kings[j.getColor()] = j
+
+    #returns the coords of the color of a king without scanning the board,
+    #unless board is not the one the kings were tracked on
+    def getKingCoords(self, board, color):
+        trackedKing = self.kings.get(color)
+        if trackedKing is not None and board[trackedKing.y][trackedKing.x] is trackedKing:
+            return trackedKing.getCoords()
+        return self.findKing(board, color)
+
+    #returns True if a piece of color attacks coords
+    #looks outward from coords along the same tables pieces use
+    def isSquareAttacked(self, board, coords, color):
+        x = coords[0]
+        y = coords[1]
+        for lineOfSight in KNIGHT_LINES[y][x]:
+            attacker = board[lineOfSight[0][1]][lineOfSight[0][0]]
+            if attacker is not None and attacker.color == color and attacker.getChr() == 'N':
+                return True
+        for lineOfSight in KING_LINES[y][x]:
+            attacker = board[lineOfSight[0][1]][lineOfSight[0][0]]
+            if attacker is not None and attacker.color == color and attacker.getChr() == 'K':
+                return True
+        #pawns take diagonally forward, so look diagonally backward
+        if color == 'W':
+            pawnY = y - 1
+        else:
+            pawnY = y + 1
+        for pawnX in [x - 1, x + 1]:
+            attacker = squareAt(board, pawnX, pawnY)
+            if attacker is not None and attacker.color == color and attacker.getChr() == 'P':
+                return True
+        #sliding pieces, stop at the first piece along each lineOfSight
+        for lineOfSight in ROOK_LINES[y][x]:
+            for attackerCoords in lineOfSight:
+                attacker = board[attackerCoords[1]][attackerCoords[0]]
+                if attacker is not None:
+                    if attacker.color == color and attacker.slidesStraight:
+                        return True
+                    break
+        for lineOfSight in BISHOP_LINES[y][x]:
+            for attackerCoords in lineOfSight:
+                attacker = board[attackerCoords[1]][attackerCoords[0]]
+                if attacker is not None:
+                    if attacker.color == color and attacker.slidesDiagonally:
+                        return True
+                    break
+        return False
+
+    #returns either True or False given a board
+    #checks the king square directly, so a board changed by makeMove
+    #does not need truncateLineOfSights first
+    def evalInCheck(self, board, color):
+        kingCoords = self.getKingCoords(board, color)
+        if color == 'W':
+            return self.isSquareAttacked(board, kingCoords, 'B')
+        else:
+            return self.isSquareAttacked(board, kingCoords, 'W')
+
+    def evalWhiteInCheck(self, board):
+        return self.evalInCheck(board, 'W')
+    
+    def evalBlackInCheck(self, board):
+        return self.evalInCheck(board, 'B')
+
+    # returns the pawns that were en passant able
+    def clearEnPassant(self, board):
+        cleared = []
+        for i in board:
+            for j in i:
+                if j is not None:
+                    if j.getChr() == 'P':
+                        if j.enPassantAble:
+                            cleared.append(j)
+                        j.disableEnPassant()
+        return cleared
+
+    # True if color has a legal move
+    # The side to move's trueMoves are used while they are current,
+    # otherwise it stops at the first legal move instead of finding the rest as updateTrueMoves does
+    def hasLegalMove(self, board, color):
+        if board is self.board and color == self.turn and self.trueMovesFound:
+            for i in board:
+                for j in i:
+                    if j is not None and j.color == color and j.trueMoveSquares:
+                        return True
+            return False
+        for i in board:
+            for j in i:
+                if j is not None and j.color == color:
+                    coords = j.getCoords()
+                    for k in j.truncatedLineOfSights:
+                        if self.checkLegal(board, coords, k):
+                            return True
+        return False
+
+    # True if neither side has the pieces to checkmate: kings alone,
+    # a single knight or bishop, or only bishops all on one colour of square
+    def isInsufficientMaterial(self):
+        material = self.material
+        for color in ['W', 'B']:
+            if material[(color, 'P')] or material[(color, 'R')] or material[(color, 'Q')]:
+                return False
+        knights = material[('W', 'N')] + material[('B', 'N')]
+        bishops = material[('W', 'B')] + material[('B', 'B')]
+        if knights + bishops <= 1:
+            return True
+        return knights == 0 and (self.bishopSquares[0] == 0 or self.bishopSquares[1] == 0)
+
+    # Returns why the game is over for the side to move, or None while it goes on:
+    # CHECKMATE, STALEMATE, INSUFFICIENT_MATERIAL, FIFTY_MOVE_RULE or REPETITION
+    # Only the first legal move is looked for, the rest come from counters
+    def getGameStatus(self):
+        if not self.hasLegalMove(self.board, self.turn):
+            if self.evalInCheck(self.board, self.turn):
+                return CHECKMATE
+            return STALEMATE
+        if self.isInsufficientMaterial():
+            return INSUFFICIENT_MATERIAL
+        if self.halfmoveClock >= 100:
+            return FIFTY_MOVE_RULE
+        if self.isThreefoldRepetition():
+            return REPETITION
+        return None
+
+    # The result of a game that ended with status, as written in PGN
+    def getResult(self, status):
+        if status is None:
+            return '*'
+        if status == CHECKMATE:
+            if self.turn == 'W':
+                return '0-1'
+            return '1-0'
+        return '1/2-1/2'
+        
+    # Returns why the side to move cannot play oldCoords to newCoords:
+    # NO_PIECE, WRONG_COLOR, ILLEGAL_MOVE or KING_UNPROTECTED, or None if it can
+    def findMoveError(self, oldCoords, newCoords):
+        movedPiece = self.board[oldCoords[1]][oldCoords[0]]
+        if movedPiece is None:
+            return NO_PIECE
+        if movedPiece.getColor() != self.turn:
+            return WRONG_COLOR
+        newSquare = newCoords[1] * 8 + newCoords[0]
+        if not (movedPiece.truncatedSquares >> newSquare) & 1:
+            return ILLEGAL_MOVE
+        if not (movedPiece.trueMoveSquares >> newSquare) & 1:
+            return KING_UNPROTECTED
+        return None
+
+    # Takes two co-ordinates
+    # Returns true if a move was made
+    # promotion is the chr of the piece a pawn becomes, asked for on stdin if None
+    def requestMove(self, oldCoords, newCoords, promotion = None):
+        error = self.findMoveError(oldCoords, newCoords)
+        if error is not None:
+            print(MOVE_ERROR_MESSAGES[error])
+            return False
+        #simulate the next move
+        self.board = self.simulateBoard(self.board, oldCoords, newCoords, False, promotion)
+        # a new move replaces the moves that were taken back
+        self.undoneMoves = []
+        if self.turn == 'W': self.turn = 'B'
+        else: self.turn = 'W'
+        self.recordPosition()
+        self.updateTrueMoves(self.board)
+        self.checkGameOver()
+        return True
+
+    # Ends the game if getGameStatus says it is over
+    def checkGameOver(self):
+        status = self.getGameStatus()
+        if status is None:
+            return
+        self.gameOver = True
+        if status == CHECKMATE:
+            if self.turn == 'W':
+                print("Checkmate, black wins!")
+            else:
+                print("Checkmate, white wins!")
+        else:
+            print("Draw by " + status)
+
+    #returns True if legal, False if illegal
+    #plays the move on the board in place and takes it back afterwards
+    def checkLegal(self, board, oldCoords, newCoords):
+        color = board[oldCoords[1]][oldCoords[0]].getColor()
+        record = self.makeMove(board, oldCoords, newCoords)
+        inCheck = self.evalInCheck(board, color)
+        self.unmakeMove(board, record)
+        return not inCheck
+
+    # quickSim promotes to a queen unless promotion is given,
+    # otherwise the player is asked on stdin
+    def simulateBoard(self, board, oldCoords, newCoords, quickSim, promotion = None):
+        if promotion is not None:
+            self.applyMove(board, oldCoords, newCoords, promotion)
+            return board
+        #choose a promotion
+        promotion = "Q"
+        if not quickSim and self.isPromotion(board, oldCoords, newCoords):
+            chosenPiece  = ""
+            while chosenPiece not in ["Q","R","B","K"]:
+                chosenPiece  = input("Choose a piece: Q/R/B/K").upper()
+            if chosenPiece == "K":
+                chosenPiece = "N"
+            promotion = chosenPiece
+
+        self.applyMove(board, oldCoords, newCoords, promotion)
+        return board
+
+    # makeMove, followed by the sight lines and, on self.board, the key
+    def applyMove(self, board, oldCoords, newCoords, promotion = "Q"):
+        record = self.makeMove(board, oldCoords, newCoords, promotion)
+        if board is self.board:
+            self.trueMovesFound = False
+            self.updateKey(record)
+            self.updateHistory(record)
+            if profiling.enabled:
+                profiling.count(profiling.MOVE_COUNTER)
+        self.refreshSightLines(board, record)
+        return record
+
+    # Plays a move for the side to move on self.board and finds the next side's trueMoves
+    # Returns the moveRecord for takeBackMove
+    def playMove(self, oldCoords, newCoords, promotion = "Q"):
+        record = self.applyMove(self.board, oldCoords, newCoords, promotion)
+        if self.turn == 'W': self.turn = 'B'
+        else: self.turn = 'W'
+        self.recordPosition()
+        self.updateTrueMoves(self.board)
+        return record
+
+    # playMove for a move from getPackedMoves
+    def playPackedMove(self, move):
+        return self.playMove(SQUARE_COORDS[move & 63], SQUARE_COORDS[(move >> 6) & 63], PROMOTION_CHRS[(move >> 12) & 7] or "Q")
+
+    # Takes back the last move from playMove
+    # trueMoves are not restored, call updateTrueMoves if they are needed
+    def takeBackMove(self, record):
+        self.trueMovesFound = False
+        self.forgetPosition()
+        self.unmakeMove(self.board, record)
+        if self.turn == 'W': self.turn = 'B'
+        else: self.turn = 'W'
+        self.key = record.key
+        self.castlingRights = record.castlingRights
+        self.moveRecords.pop()
+        self.countMaterial(record, -1)
+        self.halfmoveClock = record.halfmoveClock
+        if record.movedPiece.getColor() == 'B':
+            self.fullmoveNumber -= 1
+        self.refreshSightLines(self.board, record)
+
+    def isPromotion(self, board, oldCoords, newCoords):
+        if board[oldCoords[1]][oldCoords[0]].getChr() == 'P':
+            if newCoords[1] == 0 or newCoords[1] == 7:
+                return True
+        return False
+
+    # Plays a move on board in place
+    # promotion is the chr of the piece a pawn becomes on the last rank
+    # Returns a moveRecord which unmakeMove uses to restore the board
+    def makeMove(self, board, oldCoords, newCoords, promotion = "Q"):
+        movedPiece = board[oldCoords[1]][oldCoords[0]]
+        record = moveRecord(movedPiece, oldCoords, newCoords)
+        record.capturedPiece = board[newCoords[1]][newCoords[0]]
+        record.capturedCoords = newCoords
+
+        #handle en passant
+        if movedPiece.getChr() == 'P':
+            if oldCoords[0] != newCoords[0]:
+                if board[newCoords[1]][newCoords[0]] is None:
+                    record.capturedPiece = board[oldCoords[1]][newCoords[0]]
+                    record.capturedCoords = [newCoords[0], oldCoords[1]]
+                    board[oldCoords[1]][newCoords[0]] = None
+
+        #handle castling
+        if movedPiece.getChr() == 'K':
+            if abs(oldCoords[0]-newCoords[0]) == 2:
+                if newCoords[0] == 1:
+                    record.rookOldX, record.rookNewX = 0, 2
+                else:
+                    record.rookOldX, record.rookNewX = 7, 4
+                castlingRook = board[oldCoords[1]][record.rookOldX]
+                record.castlingRook = castlingRook
+                record.rookHasMoved = castlingRook.hasMoved
+                record.rookLineOfSightList = castlingRook.lineOfSightList
+                board[oldCoords[1]][record.rookNewX] = castlingRook
+                board[oldCoords[1]][record.rookOldX] = None
+                castlingRook.x = record.rookNewX
+                castlingRook.hasMoved = True
+                castlingRook.updateFreeMoves()
+
+        #handle normal moves
+        board[newCoords[1]][newCoords[0]] = movedPiece
+        board[oldCoords[1]][oldCoords[0]] = None
+        movedPiece.x = newCoords[0]
+        movedPiece.y = newCoords[1]
+        movedPiece.hasMoved = True
+        movedPiece.updateFreeMoves()
+
+        #enable promotion
+        if movedPiece.getChr() == 'P':
+            if newCoords[1] == 0 or newCoords[1] == 7:
+                promotedPiece = promotionPieces[promotion](newCoords[0], newCoords[1], movedPiece.getColor())
+                promotedPiece.hasMoved = True
+                board[newCoords[1]][newCoords[0]] = promotedPiece
+                record.promotedPiece = promotedPiece
+
+        #enable en passant
+        record.enPassantPawns = self.clearEnPassant(board)
+        if board[newCoords[1]][newCoords[0]].getChr() == 'P':
+            if abs(newCoords[1]-oldCoords[1]) == 2:
+                board[newCoords[1]][newCoords[0]].enableEnPassant()
+                record.enabledEnPassant = True
+        return record
+
+    # Reverses makeMove using its moveRecord
+    # Sight lines are not restored, callers that changed them must truncate again
+    def unmakeMove(self, board, record):
+        movedPiece = record.movedPiece
+        oldCoords = record.oldCoords
+        newCoords = record.newCoords
+
+        #restore en passant
+        if record.enabledEnPassant:
+            movedPiece.disableEnPassant()
+        for i in record.enPassantPawns:
+            i.enableEnPassant()
+
+        #restore the moved piece, this also removes any promoted piece
+        board[newCoords[1]][newCoords[0]] = None
+        board[oldCoords[1]][oldCoords[0]] = movedPiece
+        movedPiece.x = oldCoords[0]
+        movedPiece.y = oldCoords[1]
+        movedPiece.hasMoved = record.movedHasMoved
+        movedPiece.lineOfSightList = record.movedLineOfSightList
+
+        #restore the captured piece, including en passant victims
+        if record.capturedPiece is not None:
+            board[record.capturedCoords[1]][record.capturedCoords[0]] = record.capturedPiece
+
+        #restore the castling rook
+        if record.castlingRook is not None:
+            castlingRook = record.castlingRook
+            board[oldCoords[1]][record.rookOldX] = castlingRook
+            board[oldCoords[1]][record.rookNewX] = None
+            castlingRook.x = record.rookOldX
+            castlingRook.hasMoved = record.rookHasMoved
+            castlingRook.lineOfSightList = record.rookLineOfSightList
+
+# Everything makeMove changed on a board, so that unmakeMove can put it back
+class moveRecord(object):
+    def __init__(self, movedPiece, oldCoords, newCoords):
+        self.movedPiece = movedPiece
+        self.oldCoords = oldCoords
+        self.newCoords = newCoords
+        self.movedHasMoved = movedPiece.hasMoved
+        self.movedLineOfSightList = movedPiece.lineOfSightList
+
+        # captured piece and where it stood (differs from newCoords for en passant)
+        self.capturedPiece = None
+        self.capturedCoords = None
+
+        self.castlingRook = None
+        self.rookOldX = None
+        self.rookNewX = None
+        self.rookHasMoved = False
+        self.rookLineOfSightList = None
+
+        self.promotedPiece = None
+
+        # pawns whose en passant flag was cleared, and whether this move set one
+        self.enPassantPawns = []
+        self.enabledEnPassant = False
+
+        # key and castling rights before the move, set by gameBoard.updateKey
+        self.key = None
+        self.castlingRights = None
+        # halfmove clock before the move, set by gameBoard.updateHistory
+        self.halfmoveClock = None
+
+    # Returns the squares (y * 8 + x) whose piece or en passant flag the move changed
+    def getChangedSquares(self):
+        squares = [self.oldCoords[1] * 8 + self.oldCoords[0], self.newCoords[1] * 8 + self.newCoords[0]]
+        if self.capturedPiece is not None:
+            squares.append(self.capturedCoords[1] * 8 + self.capturedCoords[0])
+        if self.castlingRook is not None:
+            squares.append(self.oldCoords[1] * 8 + self.rookOldX)
+            squares.append(self.oldCoords[1] * 8 + self.rookNewX)
+        for i in self.enPassantPawns:
+            squares.append(i.y * 8 + i.x)
+        return squares
+
+    # Returns the pieces the move moved, took or placed
+    def getPieces(self):
+        pieces = [self.movedPiece]
+        for i in [self.capturedPiece, self.castlingRook, self.promotedPiece]:
+            if i is not None:
+                pieces.append(i)
+        return pieces
+
+# why a game ended, from gameBoard.getGameStatus
+CHECKMATE = "checkmate"
+STALEMATE = "stalemate"
+INSUFFICIENT_MATERIAL = "insufficient material"
+FIFTY_MOVE_RULE = "fifty move rule"
+REPETITION = "threefold repetition"
+
+# why a move was refused, from gameBoard.findMoveError
+NO_PIECE = "no piece"
+WRONG_COLOR = "wrong color"
+ILLEGAL_MOVE = "illegal"
+KING_UNPROTECTED = "king unprotected"
+# what requestMove prints for each
+MOVE_ERROR_MESSAGES = {NO_PIECE: "You have not selectedPiece a piece",
+                       WRONG_COLOR: "You have selectedPiece the wrong color piece",
+                       ILLEGAL_MOVE: "Your piece cannot move there",
+                       KING_UNPROTECTED: "Your king is unprotected"}
+
+# pieces a pawn can promote to, by chr
+promotionPieces = {'Q': queen, 'R': rook, 'B': bishop, 'N': knight}
+# every piece, by chr
+pieceClasses = {'P': pawn, 'N': knight, 'B': bishop, 'R': rook, 'Q': queen, 'K': king}
+
+# the stages of a move, timed while profiling is on
+profiling.register(gameBoard, ['requestMove', 'playMove', 'takeBackMove', 'simulateBoard', 'applyMove',
+                               'makeMove', 'unmakeMove', 'refreshSightLines', 'updateTrueMoves', 'checkLegal',
+                               'truncateLineOfSights', 'getGameStatus', 'getLegalMoves', 'undoMove', 'redoMove',
+                               'goToPly'])
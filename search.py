@@ -0,0 +1,289 @@
+import argparse, sys, time
+from rules import moveToText, unpackMove, moveFrom, moveTo, movePromotion, MOVE_CAPTURE
+from perft import boardFromMoves
+from book import openingBook
+import zobrist
+
+# A computer player: negamax alpha-beta over gameBoard moves, deepened one ply
+# at a time until a time or node budget runs out.
+# python search.py --time 5
+# python search.py --depth 4 --moves e2e4 e7e5
+
+PIECE_VALUES = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 0}
+MATE = 100000
+INFINITY = 1000000
+
+# how a stored score relates to the real one
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Material balance from the side to move's point of view
+def materialEvaluation(myBoard):
+    score = 0
+    for i in myBoard.board:
+        for j in i:
+            if j is not None:
+                if j.getColor() == myBoard.turn:
+                    score += PIECE_VALUES[j.getChr()]
+                else:
+                    score -= PIECE_VALUES[j.getChr()]
+    return score
+
+# moves are packed ints from gameBoard.getPackedMoves, including en passant captures
+def isCapture(move):
+    return move & MOVE_CAPTURE != 0
+
+def packedMoveToText(move):
+    return moveToText(*unpackMove(move))
+
+class searchEngine(object):
+    # evaluate scores a gameBoard for its side to move
+    # table is a zobrist.transpositionTable kept between searches
+    # book is an optional book.openingBook, whose moves are played without searching
+    def __init__(self, evaluate = materialEvaluation, table = None, book = None):
+        self.evaluate = evaluate
+        self.book = book
+        if table is None:
+            table = zobrist.transpositionTable(1 << 16)
+        self.table = table
+        self.stopRequested = False
+
+    # Asks a running search to finish, safe to call from another thread
+    def stop(self):
+        self.stopRequested = True
+
+    # Searches myBoard's side to move, one depth at a time up to maxDepth,
+    # until timeLimit seconds or nodeLimit nodes are used up
+    # report is called with a dict after each finished depth
+    # Returns the best move as [oldCoords, newCoords, promotion], or None if there are no moves
+    # A book move is returned straight away, with no iterations
+    # myBoard is played on and taken back, and left as it was
+    def search(self, myBoard, maxDepth = 64, timeLimit = None, nodeLimit = None, report = None):
+        self.startTime = time.perf_counter()
+        self.deadline = None
+        if timeLimit is not None:
+            self.deadline = self.startTime + timeLimit
+        self.nodeLimit = nodeLimit
+        self.nodes = 0
+        self.stopped = False
+        self.stopRequested = False
+        self.killers = [[] for ply in range(maxDepth + 1)]
+        self.iterations = []
+        self.table.newSearch()
+
+        if self.book is not None:
+            bookMove = self.book.chooseMove(myBoard)
+            if bookMove is not None:
+                return bookMove
+
+        rootMoves = myBoard.getPackedMoves()
+        if len(rootMoves) == 0:
+            return None
+        bestMove = rootMoves[0]
+        for depth in range(1, maxDepth + 1):
+            score, move = self.searchRoot(myBoard, rootMoves, bestMove, depth)
+            if self.stopped:
+                break
+            bestMove = move
+            elapsed = time.perf_counter() - self.startTime
+            iteration = {'depth': depth, 'score': score, 'nodes': self.nodes, 'time': elapsed,
+                         'nps': self.nodes / elapsed if elapsed > 0 else 0, 'move': packedMoveToText(move)}
+            self.iterations.append(iteration)
+            if report is not None:
+                report(iteration)
+            # a forced mate will not get any better
+            if abs(score) > MATE - 1000:
+                break
+        myBoard.updateTrueMoves(myBoard.board)
+        return unpackMove(bestMove)
+
+    # True once the search has to stop, checked at every node
+    def outOfBudget(self):
+        if self.stopRequested:
+            self.stopped = True
+        elif self.nodeLimit is not None and self.nodes >= self.nodeLimit:
+            self.stopped = True
+        elif self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stopped = True
+        return self.stopped
+
+    # The root keeps its moves across depths, the last best move goes first
+    def searchRoot(self, myBoard, rootMoves, previousBest, depth):
+        alpha = -INFINITY
+        bestMove = previousBest
+        for move in self.orderMoves(myBoard, rootMoves, previousBest, 0):
+            record = myBoard.playPackedMove(move)
+            self.nodes += 1
+            score = -self.negamax(myBoard, depth - 1, -INFINITY, -alpha, 1)
+            myBoard.takeBackMove(record)
+            if self.stopped:
+                break
+            if score > alpha:
+                alpha = score
+                bestMove = move
+        return alpha, bestMove
+
+    def negamax(self, myBoard, depth, alpha, beta, ply):
+        if self.outOfBudget():
+            return 0
+        # a repeated position is scored as a draw, as are the draws the counters show
+        if myBoard.repetitions.get(myBoard.key, 0) >= 2 or myBoard.halfmoveClock >= 100 or myBoard.isInsufficientMaterial():
+            return 0
+        inCheck = myBoard.evalInCheck(myBoard.board, myBoard.turn)
+        moves = myBoard.getPackedMoves()
+        if len(moves) == 0:
+            if inCheck:
+                return -MATE + ply
+            return 0
+        if depth <= 0:
+            return self.quiescence(myBoard, alpha, beta, ply)
+
+        alphaStart = alpha
+        tableMove = None
+        entry = self.table.probeDepth(myBoard.key)
+        if entry is not None:
+            entryDepth, (entryScore, entryFlag, tableMove) = entry
+            # mate scores depend on the ply they were found at, so are not reused
+            if entryDepth >= depth and abs(entryScore) < MATE - 1000:
+                if entryFlag == EXACT:
+                    return entryScore
+                if entryFlag == LOWER and entryScore >= beta:
+                    return entryScore
+                if entryFlag == UPPER and entryScore <= alpha:
+                    return entryScore
+
+        best = -INFINITY
+        bestMove = None
+        for move in self.orderMoves(myBoard, moves, tableMove, ply):
+            capture = isCapture(move)
+            record = myBoard.playPackedMove(move)
+            self.nodes += 1
+            score = -self.negamax(myBoard, depth - 1, -beta, -alpha, ply + 1)
+            myBoard.takeBackMove(record)
+            if self.stopped:
+                return 0
+            if score > best:
+                best = score
+                bestMove = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not capture:
+                    self.addKiller(move, ply)
+                break
+
+        if best <= alphaStart:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.store(myBoard.key, (best, flag, bestMove), depth)
+        return best
+
+    # Searches captures only, until the position is quiet
+    def quiescence(self, myBoard, alpha, beta, ply):
+        standPat = self.evaluate(myBoard)
+        if standPat >= beta:
+            return standPat
+        if standPat > alpha:
+            alpha = standPat
+        captures = []
+        for move in myBoard.getPackedMoves():
+            if isCapture(move) and movePromotion(move) in (None, "Q"):
+                captures.append(move)
+        for move in self.orderMoves(myBoard, captures, None, ply):
+            record = myBoard.playPackedMove(move)
+            self.nodes += 1
+            if self.outOfBudget():
+                myBoard.takeBackMove(record)
+                return 0
+            score = -self.quiescence(myBoard, -beta, -alpha, ply + 1)
+            myBoard.takeBackMove(record)
+            if self.stopped:
+                return 0
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    # The table's move first, then captures, most valuable victim and
+    # least valuable attacker first, then killer moves, then the rest
+    def orderMoves(self, myBoard, moves, tableMove, ply):
+        killers = []
+        if ply < len(self.killers):
+            killers = self.killers[ply]
+        scored = []
+        for index in range(len(moves)):
+            move = moves[index]
+            if move == tableMove:
+                priority = 3000000
+            elif isCapture(move):
+                newSquare = moveTo(move)
+                victim = myBoard.board[newSquare // 8][newSquare % 8]
+                victimValue = PIECE_VALUES['P']
+                if victim is not None:
+                    victimValue = PIECE_VALUES[victim.getChr()]
+                oldSquare = moveFrom(move)
+                attacker = myBoard.board[oldSquare // 8][oldSquare % 8]
+                priority = 2000000 + 10 * victimValue - PIECE_VALUES[attacker.getChr()]
+            elif move in killers:
+                priority = 1000000
+            else:
+                priority = 0
+            promotion = movePromotion(move)
+            if promotion is not None:
+                priority += PIECE_VALUES[promotion]
+            # ties keep their generated order
+            scored.append((priority, -index, move))
+        scored.sort(reverse=True, key=lambda entry: (entry[0], entry[1]))
+        return [entry[2] for entry in scored]
+
+    # quiet moves that caused a cutoff, tried early at the same ply
+    def addKiller(self, move, ply):
+        if ply >= len(self.killers):
+            return
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+
+def main():
+    parser = argparse.ArgumentParser(description="Find a move with alpha-beta search")
+    parser.add_argument("--depth", type=int, default=64, help="deepest iteration")
+    parser.add_argument("--time", type=float, default=None, help="seconds to search for")
+    parser.add_argument("--nodes", type=int, default=None, help="nodes to search")
+    parser.add_argument("--fen", default=None, help="position to start from instead of the usual one")
+    parser.add_argument("--book", default=None, help="opening book from book.py to play from first")
+    parser.add_argument("--evaluation", default="material", choices=["material", "full"],
+                        help="full adds piece-square tables, mobility and king safety, and needs NumPy")
+    parser.add_argument("--moves", nargs="*", default=[], help="moves from the start position, such as e2e4 e7e5")
+    args = parser.parse_args()
+    if args.depth == 64 and args.time is None and args.nodes is None:
+        args.time = 5.0
+
+    myBoard = boardFromMoves(args.moves, "pins", fen=args.fen)
+    if myBoard is None:
+        sys.exit(1)
+
+    def report(iteration):
+        print("depth %(depth)d score %(score)d nodes %(nodes)d time %(time).2f nps %(nps).0f move %(move)s" % iteration)
+
+    book = None
+    if args.book is not None:
+        book = openingBook(args.book)
+    evaluate = materialEvaluation
+    if args.evaluation == "full":
+        # NumPy is only needed for this evaluation
+        import evaluation
+        evaluate = evaluation.evaluate
+    bestMove = searchEngine(evaluate, book=book).search(myBoard, args.depth, args.time, args.nodes, report)
+    if bestMove is None:
+        print("No legal moves")
+    else:
+        print("bestmove", moveToText(bestMove[0], bestMove[1], bestMove[2]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import argparse, json, multiprocessing, os, random, time
+from rules import gameBoard, moveToText
+from search import searchEngine
+
+# Plays many games without a window, spread over a pool of processes,
+# and writes each game to a file as soon as it finishes, one JSON object per line.
+# Moves are random, or chosen by searchEngine after some random opening moves.
+# python selfplay.py 100 --workers 4 --output games.jsonl
+# python selfplay.py 20 --player engine --nodes 2000 --random-plies 6
+
+# the searchEngine of this process, made by startWorker
+engine = None
+
+def startWorker(player):
+    global engine
+    if player == "engine":
+        engine = searchEngine()
+
+# Plays one game, task is (game number, seed, options)
+# Promotions come from the chosen move, a random game underpromotes as often as it queens
+def playGame(task):
+    index, seed, options = task
+    rand = random.Random(seed)
+    start = time.perf_counter()
+    myBoard = gameBoard(options['generator'])
+    moves = []
+    result, termination = "*", "ply limit"
+    while True:
+        status = myBoard.getGameStatus()
+        if status is not None:
+            result, termination = myBoard.getResult(status), status
+            break
+        if len(moves) >= options['maxPlies']:
+            break
+        if engine is None or len(moves) < options['randomPlies']:
+            move = rand.choice(myBoard.getLegalMoves())
+        else:
+            move = engine.search(myBoard, options['depth'], None, options['nodes'])
+        myBoard.playMove(move[0], move[1], move[2] or "Q")
+        moves.append(moveToText(move[0], move[1], move[2]))
+    return {'game': index, 'seed': seed, 'result': result, 'termination': termination,
+            'plies': len(moves), 'moves': moves, 'worker': os.getpid(),
+            'time': time.perf_counter() - start}
+
+def main():
+    parser = argparse.ArgumentParser(description="Play games without a window on a pool of processes")
+    parser.add_argument("games", type=int)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes to play on")
+    parser.add_argument("--player", default="random", choices=["random", "engine"])
+    parser.add_argument("--depth", type=int, default=2, help="engine search depth")
+    parser.add_argument("--nodes", type=int, default=None, help="engine nodes per move")
+    parser.add_argument("--random-plies", type=int, default=4, help="random moves before the engine plays")
+    parser.add_argument("--max-plies", type=int, default=300, help="plies before a game is stopped unfinished")
+    parser.add_argument("--generator", default="pins", choices=["pins", "objects", "bitboard"])
+    parser.add_argument("--seed", type=int, default=0, help="game n is played with seed + n")
+    parser.add_argument("--output", default="games.jsonl", help="file the games are written to")
+    args = parser.parse_args()
+
+    options = {'generator': args.generator, 'maxPlies': args.max_plies, 'randomPlies': args.random_plies,
+               'depth': args.depth, 'nodes': args.nodes}
+    tasks = [(index, args.seed + index, options) for index in range(args.games)]
+
+    # games and seconds spent playing, by worker process
+    workers = {}
+    results = {}
+    plies = 0
+    start = time.perf_counter()
+    with open(args.output, "w") as output:
+        with multiprocessing.Pool(args.workers, startWorker, (args.player,)) as pool:
+            # games arrive in the order they finish, not the order they started
+            for game in pool.imap_unordered(playGame, tasks):
+                output.write(json.dumps(game) + "\n")
+                output.flush()
+                worker = workers.setdefault(game['worker'], [0, 0.0])
+                worker[0] += 1
+                worker[1] += game['time']
+                results[game['result']] = results.get(game['result'], 0) + 1
+                plies += game['plies']
+    elapsed = time.perf_counter() - start
+
+    print("games: %d  plies: %d  time: %.2f s" % (args.games, plies, elapsed))
+    if elapsed > 0:
+        print("games/s: %.2f  plies/s: %.0f" % (args.games / elapsed, plies / elapsed))
+    print("results:", "  ".join("%s %d" % (result, count) for result, count in sorted(results.items())))
+    for pid, (games, busy) in sorted(workers.items()):
+        print("worker %d: %d games  %.2f games/s" % (pid, games, games / busy if busy > 0 else 0))
+
+if __name__ == '__main__':
+    main()
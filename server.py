@@ -0,0 +1,210 @@
+import argparse, asyncio, concurrent.futures, json, random, sys, time
+from rules import gameBoard, textToMove, moveToText
+
+# A game server holding many games at once in one process, and a client that loads it.
+# Clients send one command per line and get one JSON object per line back:
+#   new [fen]            starts a game, the reply gives its number
+#   move <game> <move>   plays a move such as e2e4 or e7e8q
+#   fen <game>           the position of a game
+#   end <game>           forgets a game
+# Every reply has "result", "ok" or why the command was refused, such as "illegal" or "king unprotected".
+# Replies about a game also give whose turn it is, the legal moves and "status",
+# why the game ended (such as "checkmate") or null.
+# Moves are checked and played on a thread pool so a slow position does not hold up other connections,
+# each game takes one command at a time.
+# python server.py serve --port 8765
+# python server.py load --connections 50 --games 4
+
+# results besides ok and the move errors of gameBoard.findMoveError
+UNKNOWN_COMMAND = "unknown command"
+NO_GAME = "no game"
+BAD_MOVE = "unreadable move"
+BAD_FEN = "bad fen"
+GAME_OVER = "game over"
+TOO_MANY_GAMES = "too many games"
+
+PROMOTIONS = ('Q', 'R', 'B', 'N')
+
+class gameSession(object):
+    def __init__(self, gameId, myBoard):
+        self.gameId = gameId
+        self.board = myBoard
+        # the status the game ended with, None while it goes on
+        # a game can start from a FEN that is already over
+        self.status = myBoard.getGameStatus()
+        if self.status is not None:
+            myBoard.gameOver = True
+        self.lock = asyncio.Lock()
+
+    # Plays text on the board, run on the executor
+    # Returns the reply
+    def playText(self, text):
+        try:
+            move = textToMove(text)
+        except (ValueError, IndexError):
+            move = None
+        if move is None or len(text) > 5 or (move[2] is not None and move[2] not in PROMOTIONS):
+            return self.reply(BAD_MOVE)
+        if self.status is not None:
+            return self.reply(GAME_OVER)
+        error = self.board.findMoveError(move[0], move[1])
+        if error is not None:
+            return self.reply(error)
+        self.board.playMove(move[0], move[1], move[2] or "Q")
+        self.status = self.board.getGameStatus()
+        if self.status is not None:
+            self.board.gameOver = True
+        return self.reply("ok")
+
+    def reply(self, result):
+        moves = []
+        if self.status is None:
+            moves = [moveToText(*move) for move in self.board.getLegalMoves()]
+        return {'game': self.gameId, 'result': result, 'turn': self.board.turn,
+                'status': self.status, 'moves': moves}
+
+class gameServer(object):
+    def __init__(self, threads, maxGames):
+        self.executor = concurrent.futures.ThreadPoolExecutor(threads)
+        self.maxGames = maxGames
+        # gameSession by game number
+        self.sessions = {}
+        self.nextId = 1
+
+    async def run(self, host, port):
+        server = await asyncio.start_server(self.handleConnection, host, port)
+        print("listening on %s:%d" % (host, port))
+        async with server:
+            await server.serve_forever()
+
+    async def handleConnection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = await self.handleCommand(line.decode("utf-8", errors="replace").split())
+                writer.write((json.dumps(reply) + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handleCommand(self, words):
+        loop = asyncio.get_running_loop()
+        if len(words) == 0:
+            return {'result': UNKNOWN_COMMAND}
+        if words[0] == "new":
+            if len(self.sessions) >= self.maxGames:
+                return {'result': TOO_MANY_GAMES}
+            fen = " ".join(words[1:]) or None
+            try:
+                myBoard = await loop.run_in_executor(self.executor, gameBoard, "pins", "incremental", False, None, fen)
+            except ValueError:
+                return {'result': BAD_FEN}
+            session = gameSession(self.nextId, myBoard)
+            self.sessions[session.gameId] = session
+            self.nextId += 1
+            return session.reply("ok")
+        if words[0] not in ("move", "fen", "end") or len(words) < 2:
+            return {'result': UNKNOWN_COMMAND}
+        try:
+            session = self.sessions.get(int(words[1]))
+        except ValueError:
+            session = None
+        if session is None:
+            return {'result': NO_GAME}
+        async with session.lock:
+            if words[0] == "move":
+                if len(words) != 3:
+                    return session.reply(BAD_MOVE)
+                return await loop.run_in_executor(self.executor, session.playText, words[2])
+            if words[0] == "fen":
+                return {'game': session.gameId, 'result': "ok", 'fen': session.board.getFen()}
+            del self.sessions[session.gameId]
+            return {'game': session.gameId, 'result': "ok"}
+
+# Plays games one after another on one connection, sending random legal moves
+# and, with chance illegal, a random move that is probably not legal
+# Adds the seconds each command took to latencies and counts the results
+async def loadConnection(host, port, games, maxPlies, illegal, rand, latencies, results):
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def send(command):
+        start = time.perf_counter()
+        writer.write((command + "\n").encode())
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        results[reply['result']] = results.get(reply['result'], 0) + 1
+        return reply
+
+    moves = 0
+    for game in range(games):
+        reply = await send("new")
+        gameId = reply['game']
+        for ply in range(maxPlies):
+            if reply['status'] is not None or len(reply['moves']) == 0:
+                break
+            if rand.random() < illegal:
+                text = "".join(rand.choice("abcdefgh") + rand.choice("12345678") for square in range(2))
+            else:
+                text = rand.choice(reply['moves'])
+            nextReply = await send("move %d %s" % (gameId, text))
+            if nextReply['result'] == "ok":
+                moves += 1
+                reply = nextReply
+        await send("end %d" % gameId)
+    writer.close()
+    return moves
+
+async def runLoad(args):
+    latencies = []
+    results = {}
+    start = time.perf_counter()
+    moves = await asyncio.gather(*[loadConnection(args.host, args.port, args.games, args.max_plies, args.illegal,
+                                                  random.Random(args.seed + index), latencies, results)
+                                   for index in range(args.connections)])
+    elapsed = time.perf_counter() - start
+    moves = sum(moves)
+    latencies.sort()
+    print("connections: %d  games: %d  moves: %d  commands: %d  time: %.2f s"
+          % (args.connections, args.connections * args.games, moves, len(latencies), elapsed))
+    print("moves/s: %.0f  commands/s: %.0f" % (moves / elapsed, len(latencies) / elapsed))
+    print("latency ms: p50 %.2f  p99 %.2f  max %.2f" % (1000 * latencies[len(latencies) // 2],
+                                                        1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+                                                        1000 * latencies[-1]))
+    print("results:", "  ".join("%s %d" % (result, count) for result, count in sorted(results.items())))
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve many games over TCP, or load a server with random games")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the server")
+    serve.add_argument("--threads", type=int, default=4, help="threads moves are checked and played on")
+    serve.add_argument("--max-games", type=int, default=10000, help="games kept at once")
+    load = commands.add_parser("load", help="play random games against a running server")
+    load.add_argument("--connections", type=int, default=20)
+    load.add_argument("--games", type=int, default=5, help="games played one after another on each connection")
+    load.add_argument("--max-plies", type=int, default=200, help="plies before a game is ended")
+    load.add_argument("--illegal", type=float, default=0.05, help="chance of sending a random, probably illegal move")
+    load.add_argument("--seed", type=int, default=0, help="connection n plays with seed + n")
+    for command in [serve, load]:
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            asyncio.run(gameServer(args.threads, args.max_games).run(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    else:
+        try:
+            asyncio.run(runLoad(args))
+        except ConnectionError as error:
+            print("Cannot reach the server:", error)
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import random
+
+# Zobrist keys: a position's key is the XOR of a random 64 bit number for each
+# piece on each square, the side to move, the castling rights and the en passant file.
+# A move changes the key by XORing out what it removed and XORing in what it added.
+# Squares are y * 8 + x, castling rights are the bitboard.py flags.
+
+keyRandom = random.Random(20240601)
+
+def randomKey():
+    return keyRandom.getrandbits(64)
+
+# PIECE_KEYS[(color, chr)][square]
+PIECE_KEYS = {}
+for color in ['W', 'B']:
+    for pieceChr in ['P', 'N', 'B', 'R', 'Q', 'K']:
+        PIECE_KEYS[(color, pieceChr)] = [randomKey() for square in range(64)]
+
+# XORed in when black is to move
+SIDE_KEY = randomKey()
+
+# CASTLING_KEYS[rights], one random key per right, combined for every set of rights
+castlingRightKeys = [randomKey() for right in range(4)]
+CASTLING_KEYS = []
+for rights in range(16):
+    key = 0
+    for right in range(4):
+        if rights & (1 << right):
+            key ^= castlingRightKeys[right]
+    CASTLING_KEYS.append(key)
+
+# EN_PASSANT_KEYS[x] of the pawn that can be taken en passant
+EN_PASSANT_KEYS = [randomKey() for x in range(8)]
+
+# A fixed size table of results by position key
+# Each slot holds two entries, one kept for the deepest result
+# and one always replaced, so deep results survive a stream of shallow ones.
+# Entries from an older search (see newSearch) are replaced regardless of depth.
+class transpositionTable(object):
+    def __init__(self, size = 1 << 16):
+        self.size = size
+        # entry is (key, depth, age, data)
+        self.deepEntries = [None] * size
+        self.recentEntries = [None] * size
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    # Returns the data stored for key, or None
+    def probe(self, key):
+        slot = key % self.size
+        for entry in [self.deepEntries[slot], self.recentEntries[slot]]:
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry[3]
+        self.misses += 1
+        return None
+
+    # Returns (depth, data) stored for key, or None
+    def probeDepth(self, key):
+        slot = key % self.size
+        for entry in [self.deepEntries[slot], self.recentEntries[slot]]:
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return (entry[1], entry[3])
+        self.misses += 1
+        return None
+
+    # depth is how much work the data cost, deeper entries are kept longer
+    def store(self, key, data, depth = 0):
+        slot = key % self.size
+        entry = (key, depth, self.age, data)
+        self.stores += 1
+        deepEntry = self.deepEntries[slot]
+        if deepEntry is None or deepEntry[0] == key or deepEntry[2] != self.age or depth >= deepEntry[1]:
+            self.deepEntries[slot] = entry
+            # a key lives in one entry only
+            recentEntry = self.recentEntries[slot]
+            if recentEntry is not None and recentEntry[0] == key:
+                self.recentEntries[slot] = None
+        else:
+            self.recentEntries[slot] = entry
+
+    # ages existing entries so new results replace them first
+    def newSearch(self):
+        self.age += 1
+
+    def clear(self):
+        self.deepEntries = [None] * self.size
+        self.recentEntries = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0